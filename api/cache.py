@@ -0,0 +1,78 @@
+"""
+In-process caching helpers for the API
+Provides a small LRU cache with per-entry expiry for hot lookups
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """Least-recently-used cache whose entries expire after a fixed time-to-live"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Initialize the cache
+        
+        Args:
+            maxsize: Maximum number of entries kept before evicting the oldest
+            ttl: Seconds an entry stays valid after it is stored
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            The cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+            
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+            
+        self._entries.move_to_end(key)
+        return value
+        
+    def set(self, key: Hashable, value: Any):
+        """
+        Store a value, evicting the least recently used entry when full
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            
+    def invalidate(self, key: Hashable) -> bool:
+        """
+        Remove a single entry
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            True if an entry was removed, False otherwise
+        """
+        return self._entries.pop(key, None) is not None
+        
+    def clear(self):
+        """Remove all entries"""
+        self._entries.clear()
+        
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -3,18 +3,25 @@ FastAPI Application for FHIR Patient Data API
 Provides endpoints to retrieve patient data from Neo4j graph database
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import List, Optional
+from neo4j import AsyncSession
+import hashlib
 import logging
+import orjson
 
 from api.models import (
-    PatientSummary, 
+    PatientListResponse,
     PatientDetails, 
+    PatientBatchRequest,
     PatientEncountersResponse,
     ErrorResponse
 )
-from api.database import db_service
+from api.database import db_service, neo4j_session
+import config
 
 
 # Configure logging
@@ -26,30 +33,56 @@ logger = logging.getLogger(__name__)
 
 
 # Create FastAPI app
+#
+# Routes return dicts already shaped by their Cypher projections, so they
+# declare response_model=None and list the Pydantic model under `responses`
+# instead: the OpenAPI schema is unchanged but responses skip re-validation.
 app = FastAPI(
     title="FHIR Patient Data API",
     description="API for retrieving patient data from Neo4j graph database",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse
 )
 
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure appropriately for production
+    allow_origins=config.CORS_ORIGINS,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "DELETE"],
+    allow_headers=["Authorization", "Content-Type", "If-None-Match"],
+    expose_headers=["ETag"],
+    max_age=config.CORS_MAX_AGE,
 )
 
 
+# Compress larger responses; patient lists repeat the same keys on every row
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+
+def compute_etag(payload) -> str:
+    """Compute a weak ETag from the JSON serialization of a response payload"""
+    digest = hashlib.blake2b(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS), digest_size=8).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Check an If-None-Match request header against an ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database connection on startup"""
     try:
-        db_service.connect()
+        await db_service.connect()
+        await db_service.warm_query_plans()
         logger.info("FastAPI application started successfully")
     except Exception as e:
         logger.error(f"Failed to start application: {e}")
@@ -59,7 +92,7 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close database connection on shutdown"""
-    db_service.close()
+    await db_service.close()
     logger.info("FastAPI application shut down")
 
 
@@ -73,6 +106,7 @@ async def root():
         "endpoints": {
             "patients": "/patients",
             "patient_details": "/patients/{mrn}",
+            "patient_batch": "/patients/batch",
             "patient_encounters": "/patients/{mrn}/encounters"
         }
     }
@@ -81,7 +115,7 @@ async def root():
 @app.get("/health", tags=["Health"])
 async def health_check():
     """Health check endpoint"""
-    db_healthy = db_service.health_check()
+    db_healthy = await db_service.health_check()
     
     if db_healthy:
         return {
@@ -97,25 +131,40 @@ async def health_check():
 
 @app.get(
     "/patients",
-    response_model=List[PatientSummary],
+    response_model=None,
     tags=["Patients"],
     summary="Fetch all patients",
-    description="Retrieve a list of all patients with basic information (MRN, name, gender, DOB)"
+    description="Retrieve a page of patients with basic information (MRN, name, gender, DOB)",
+    responses={
+        200: {"model": PatientListResponse, "description": "Page of patients retrieved successfully"}
+    }
 )
 async def get_all_patients(
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of patients to return"),
-    skip: int = Query(0, ge=0, description="Number of patients to skip (for pagination)")
+    after_lname: Optional[str] = Query(None, description="Cursor: last name from the previous page's next_cursor"),
+    after_fname: Optional[str] = Query(None, description="Cursor: first name from the previous page's next_cursor"),
+    after_id: Optional[str] = Query(None, description="Cursor: patient ID from the previous page's next_cursor"),
+    session: AsyncSession = Depends(neo4j_session)
 ):
     """
-    Fetch all patients with basic information
+    Fetch a page of patients with basic information
     
     - **limit**: Maximum number of patients to return (default: 100, max: 1000)
-    - **skip**: Number of patients to skip for pagination (default: 0)
+    - **after_lname**, **after_fname**, **after_id**: Cursor returned as
+      `next_cursor` by the previous page; omit all three for the first page
     """
     try:
-        patients = db_service.get_all_patients(limit=limit, skip=skip)
-        logger.info(f"Retrieved {len(patients)} patients (limit={limit}, skip={skip})")
-        return patients
+        result = await db_service.get_all_patients(
+            session,
+            limit=limit,
+            after_lname=after_lname,
+            after_fname=after_fname,
+            after_id=after_id
+        )
+        logger.info(f"Retrieved {len(result['patients'])} patients (limit={limit}, after_id={after_id})")
+        # Returned as a Response so the page goes straight to orjson in C
+        # instead of being walked row by row by jsonable_encoder first
+        return ORJSONResponse(content=result)
     except Exception as e:
         logger.error(f"Error retrieving patients: {e}")
         raise HTTPException(
@@ -124,18 +173,88 @@ async def get_all_patients(
         )
 
 
+@app.get(
+    "/patients/stream",
+    tags=["Patients"],
+    summary="Stream all patients",
+    description="Stream every patient with basic information as newline-delimited JSON (NDJSON)",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}},
+            "description": "One PatientSummary JSON object per line"
+        }
+    }
+)
+async def stream_all_patients(
+    after_lname: Optional[str] = Query(None, description="Resume after this last name"),
+    after_fname: Optional[str] = Query(None, description="Resume after this first name"),
+    after_id: Optional[str] = Query(None, description="Resume after this patient ID")
+):
+    """
+    Stream all patients as NDJSON, ordered by last name, first name and MRN
+    
+    - **after_lname**, **after_fname**, **after_id**: Optional cursor taken
+      from the last line received, to resume an interrupted stream
+    """
+    async def generate():
+        async for patient in db_service.stream_all_patients(
+            after_lname=after_lname,
+            after_fname=after_fname,
+            after_id=after_id
+        ):
+            yield orjson.dumps(patient) + b"\n"
+            
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@app.post(
+    "/patients/batch",
+    response_model=None,
+    tags=["Patients"],
+    summary="Get details for several patients",
+    description="Retrieve complete patient demographics for up to 1000 MRNs in a single request",
+    responses={
+        200: {"model": List[PatientDetails], "description": "Patient details retrieved successfully"}
+    }
+)
+async def get_patients_batch(request: PatientBatchRequest, session: AsyncSession = Depends(neo4j_session)):
+    """
+    Get complete patient details for a list of Medical Record Numbers (MRNs)
+    
+    - **mrns**: Up to 1000 Medical Record Numbers (patient IDs)
+    
+    MRNs that do not match a patient are left out of the response.
+    """
+    try:
+        patients = await db_service.get_patients_by_mrns(session, request.mrns)
+        logger.info(f"Retrieved {len(patients)} patients for batch of {len(request.mrns)} MRNs")
+        return ORJSONResponse(content=patients)
+    except Exception as e:
+        logger.error(f"Error retrieving patient batch: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to retrieve patients: {str(e)}"
+        )
+
+
 @app.get(
     "/patients/{mrn}",
-    response_model=PatientDetails,
+    response_model=None,
     tags=["Patients"],
     summary="Get patient details by MRN",
     description="Retrieve complete patient demographics and details by Medical Record Number (MRN/ID)",
     responses={
-        200: {"description": "Patient details retrieved successfully"},
+        200: {"model": PatientDetails, "description": "Patient details retrieved successfully"},
+        304: {"description": "Patient details unchanged since the ETag sent in If-None-Match"},
         404: {"model": ErrorResponse, "description": "Patient not found"}
     }
 )
-async def get_patient_details(mrn: str):
+async def get_patient_details(
+    mrn: str,
+    if_none_match: Optional[str] = Header(None),
+    session: AsyncSession = Depends(neo4j_session)
+):
     """
     Get complete patient details by Medical Record Number (MRN)
     
@@ -145,9 +264,13 @@ async def get_patient_details(mrn: str):
     - Name, gender, date of birth
     - Address information
     - Marital status, race, ethnicity
+    
+    The response carries an `ETag` header. Sending it back in `If-None-Match`
+    returns `304 Not Modified` while the details are unchanged; hot patients
+    are answered from the detail cache without touching Neo4j.
     """
     try:
-        patient = db_service.get_patient_by_mrn(mrn)
+        patient = await db_service.get_patient_by_mrn(session, mrn)
         
         if patient is None:
             raise HTTPException(
@@ -155,8 +278,12 @@ async def get_patient_details(mrn: str):
                 detail=f"Patient not found with MRN: {mrn}"
             )
             
+        etag = compute_etag(patient)
+        if etag_matches(etag, if_none_match):
+            return Response(status_code=304, headers={"ETag": etag})
+            
         logger.info(f"Retrieved patient details for MRN: {mrn}")
-        return patient
+        return ORJSONResponse(content=patient, headers={"ETag": etag})
     except HTTPException:
         raise
     except Exception as e:
@@ -169,16 +296,16 @@ async def get_patient_details(mrn: str):
 
 @app.get(
     "/patients/{mrn}/encounters",
-    response_model=PatientEncountersResponse,
+    response_model=None,
     tags=["Patients"],
     summary="Get patient visit history by MRN",
     description="Retrieve patient encounter/visit history by Medical Record Number (MRN/ID)",
     responses={
-        200: {"description": "Patient encounters retrieved successfully"},
+        200: {"model": PatientEncountersResponse, "description": "Patient encounters retrieved successfully"},
         404: {"model": ErrorResponse, "description": "Patient not found"}
     }
 )
-async def get_patient_encounters(mrn: str):
+async def get_patient_encounters(mrn: str, session: AsyncSession = Depends(neo4j_session)):
     """
     Get patient encounter/visit history by Medical Record Number (MRN)
     
@@ -190,7 +317,7 @@ async def get_patient_encounters(mrn: str):
     - List of encounters with dates, types, and status
     """
     try:
-        result = db_service.get_patient_encounters(mrn)
+        result = await db_service.get_patient_encounters(session, mrn)
         
         if result is None:
             raise HTTPException(
@@ -210,6 +337,26 @@ async def get_patient_encounters(mrn: str):
         )
 
 
+@app.delete(
+    "/cache/patient/{mrn}",
+    tags=["Cache"],
+    summary="Invalidate cached patient details",
+    description="Remove a patient from the in-memory detail cache so the next lookup reads from Neo4j"
+)
+async def invalidate_patient_cache(mrn: str):
+    """
+    Invalidate cached patient details by Medical Record Number (MRN)
+    
+    - **mrn**: Medical Record Number (patient ID)
+    """
+    removed = db_service.invalidate_patient(mrn)
+    logger.info(f"Invalidated patient cache for MRN: {mrn} (cached={removed})")
+    return {
+        "mrn": mrn,
+        "invalidated": removed
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -28,6 +28,39 @@ class PatientSummary(BaseModel):
         }
 
 
+class PatientCursor(BaseModel):
+    """Keyset cursor pointing at the last patient of a page"""
+    after_lname: Optional[str] = Field(None, description="Last name of the last patient returned")
+    after_fname: Optional[str] = Field(None, description="First name of the last patient returned")
+    after_id: str = Field(..., description="MRN of the last patient returned")
+
+
+class PatientListResponse(BaseModel):
+    """Response model for the paginated patient list endpoint"""
+    patients: List[PatientSummary] = Field(..., description="Page of patients")
+    next_cursor: Optional[PatientCursor] = Field(None, description="Cursor for the next page, null on the last page")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "patients": [
+                    {
+                        "id": "4877dc14-609c-a22b-0a94-e15707167428",
+                        "fname": "Abe604",
+                        "lname": "Sipes176",
+                        "gender": "male",
+                        "birthDate": "1970-03-12"
+                    }
+                ],
+                "next_cursor": {
+                    "after_lname": "Sipes176",
+                    "after_fname": "Abe604",
+                    "after_id": "4877dc14-609c-a22b-0a94-e15707167428"
+                }
+            }
+        }
+
+
 class PatientDetails(BaseModel):
     """Complete patient demographics and details"""
     id: str = Field(..., description="Medical Record Number (MRN)")
@@ -64,22 +97,35 @@ class PatientDetails(BaseModel):
         }
 
 
+class PatientBatchRequest(BaseModel):
+    """Request body for fetching several patients at once"""
+    mrns: List[str] = Field(..., min_length=1, max_length=1000, description="Medical Record Numbers (MRNs) to fetch, at most 1000")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "mrns": [
+                    "4877dc14-609c-a22b-0a94-e15707167428"
+                ]
+            }
+        }
+
+
 class Encounter(BaseModel):
     """Patient encounter/visit information"""
     id: str = Field(..., description="Encounter ID")
     status: Optional[str] = Field(None, description="Encounter status")
-    encounterClass: Optional[str] = Field(None, alias="class", description="Encounter class (e.g., AMB for ambulatory)")
+    encounterClass: Optional[str] = Field(None, description="Encounter class (e.g., AMB for ambulatory)")
     type: Optional[str] = Field(None, description="Encounter type")
     encstart: Optional[str] = Field(None, description="Encounter start date/time")
     encend: Optional[str] = Field(None, description="Encounter end date/time")
     
     class Config:
-        populate_by_name = True
         json_schema_extra = {
             "example": {
                 "id": "4877dc14-609c-a22b-6df5-86312997308a",
                 "status": "finished",
-                "class": "AMB",
+                "encounterClass": "AMB",
                 "type": "Well child visit (procedure)",
                 "encstart": "1981-03-26T16:41:18+00:00",
                 "encend": "1981-03-26T16:56:18+00:00"
@@ -104,7 +150,7 @@ class PatientEncountersResponse(BaseModel):
                     {
                         "id": "4877dc14-609c-a22b-6df5-86312997308a",
                         "status": "finished",
-                        "class": "AMB",
+                        "encounterClass": "AMB",
                         "type": "Well child visit (procedure)",
                         "encstart": "1981-03-26T16:41:18+00:00",
                         "encend": "1981-03-26T16:56:18+00:00"
@@ -7,6 +7,27 @@ Contains Neo4j connection settings and data directory path
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "Qwaszx12"  # Change this to match your Neo4j password
+NEO4J_DATABASE = "neo4j"  # Database the injector writes to
+
+# Neo4j Driver Connection Pool Settings
+NEO4J_MAX_POOL_SIZE = 50  # Maximum connections held by the driver
+NEO4J_ACQ_TIMEOUT = 30.0  # Seconds to wait for a free connection from the pool
+NEO4J_MAX_LIFETIME = 3600  # Seconds before a pooled connection is recycled
+
+# API Cache Settings
+PATIENT_CACHE_SIZE = 10000  # Maximum number of patient detail responses cached
+PATIENT_CACHE_TTL = 300  # Seconds a cached patient detail response stays valid
+HEALTH_CHECK_CACHE_TTL = 5  # Seconds a successful health check is reused
+
+# API CORS Settings
+CORS_ORIGINS = ["http://localhost:3000"]  # Change this to the origins allowed to call the API
+CORS_MAX_AGE = 86400  # Seconds browsers may cache a preflight response
+
+# Graph Builder Settings
+BATCH_SIZE = 5000  # Maximum rows per UNWIND query and per inner transaction of whole-graph passes
+INGEST_WORKERS = 8  # Number of FHIR files ingested concurrently
+STREAM_THRESHOLD = 64 * 1024 * 1024  # File size in bytes from which bundles are stream-parsed
+INITIAL_LOAD = False  # CREATE instead of MERGE; only enable when loading into an empty database
 
 # Data Directory
 DATA_DIR = "./data"
@@ -3,18 +3,471 @@ FHIR Graph Builder for Neo4j
 Processes FHIR Bundle JSON files and creates a graph database representation
 """
 
-import json
 import logging
+import mmap
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import count
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from neo4j import GraphDatabase
+from typing import Callable, Dict, Iterable, Iterator, List, Any, Optional
+from neo4j import GraphDatabase, RoutingControl, Session
+import ijson
+import orjson
 from neo4j.exceptions import ServiceUnavailable
 
 
+def _ref_id(reference: Optional[str]) -> Optional[str]:
+    """
+    Normalize a FHIR reference to the id of the referenced resource
+    
+    Literal references such as "urn:uuid:<id>" or "Patient/<id>" are reduced
+    to the bare id so relationship joins can match node ids by equality.
+    Conditional references ("Practitioner?identifier=...") are kept as-is.
+    
+    Args:
+        reference: Reference string from a FHIR Reference element
+        
+    Returns:
+        The referenced resource id, or the reference unchanged if it is not a literal reference
+    """
+    if not reference or "?" in reference:
+        return reference
+    if reference.startswith("urn:uuid:"):
+        return reference[len("urn:uuid:"):]
+    return reference.rsplit("/", 1)[-1]
+
+
+def _compile_spec(spec: Dict[str, str]) -> Callable[[Dict], Dict]:
+    """
+    Generate a specialized extractor function from a field spec
+    
+    The spec is turned into straight-line Python source once, at import time:
+    every distinct path prefix is looked up a single time and shared by the
+    fields below it, numeric segments select the first element of a list
+    (how FHIR repeats name, address, coding, ...) and paths ending in
+    "reference" return the referenced resource id (see _ref_id).
+    
+    Args:
+        spec: Mapping of node property name to dotted path such as "name.0.given.0"
+        
+    Returns:
+        Function mapping a FHIR resource to its node property dictionary
+    """
+    variables = {(): "resource"}
+    lines = []
+    fields = []
+    
+    for name, path in spec.items():
+        keys = tuple(int(key) if key.isdigit() else key for key in path.split("."))
+        
+        for depth in range(1, len(keys) + 1):
+            prefix = keys[:depth]
+            if prefix in variables:
+                continue
+                
+            parent = variables[prefix[:-1]]
+            key = prefix[-1]
+            if isinstance(key, int):
+                expr = f"{parent}[0] if isinstance({parent}, list) and {parent} else None"
+            elif parent == "resource":
+                expr = f"resource.get({key!r})"
+            else:
+                expr = f"{parent}.get({key!r}) if isinstance({parent}, dict) else None"
+                
+            variables[prefix] = f"v{len(variables)}"
+            lines.append(f"    {variables[prefix]} = {expr}")
+            
+        value = variables[keys]
+        if keys[-1] == "reference":
+            value = f"_ref_id({value})"
+        elif len(keys) > 1:
+            value = f"({value} if {value} != {{}} else None)"
+        fields.append(f"        {name!r}: {value},")
+        
+    source = "\n".join(["def extractor(resource):", *lines, "    return {", *fields, "    }", ""])
+    namespace = {"_ref_id": _ref_id}
+    exec(compile(source, "<fhir extractor>", "exec"), namespace)
+    return namespace["extractor"]
+
+
+# Node property extraction paths per resourceType, compiled once at import
+PATIENT_SPEC = {
+    "id": "id",
+    "fname": "name.0.given.0",
+    "lname": "name.0.family",
+    "gender": "gender",
+    "birthDate": "birthDate",
+    "city": "address.0.city",
+    "state": "address.0.state",
+    "postalCode": "address.0.postalCode",
+    "country": "address.0.country",
+    "addressLine": "address.0.line.0",
+    "maritalStatus": "maritalStatus.text",
+}
+
+PRACTITIONER_SPEC = {
+    "id": "id",
+    "fname": "name.0.given.0",
+    "lname": "name.0.family",
+    "gender": "gender",
+    "prefix": "name.0.prefix.0",
+}
+
+ORGANIZATION_SPEC = {
+    "id": "id",
+    "name": "name",
+    "orgtype": "type.0.coding.0.display",
+    "addressCity": "address.0.city",
+    "addressState": "address.0.state",
+    "addressLine": "address.0.line.0",
+}
+
+ENCOUNTER_SPEC = {
+    "id": "id",
+    "status": "status",
+    "class": "class.code",
+    "type": "type.0.text",
+    "encstart": "period.start",
+    "encend": "period.end",
+    "patient_ref": "subject.reference",
+    "provider_ref": "participant.0.individual.reference",
+    "org_ref": "serviceProvider.reference",
+}
+
+CONDITION_SPEC = {
+    "id": "id",
+    "clinicalStatus": "clinicalStatus.coding.0.code",
+    "verificationStatus": "verificationStatus.coding.0.code",
+    "code": "code.coding.0.code",
+    "display": "code.text",
+    "onsetDateTime": "onsetDateTime",
+    "recordedDate": "recordedDate",
+    "patient_ref": "subject.reference",
+    "encounter_ref": "encounter.reference",
+}
+
+OBSERVATION_SPEC = {
+    "id": "id",
+    "status": "status",
+    "category": "category.0.coding.0.display",
+    "code": "code.coding.0.code",
+    "display": "code.text",
+    "effectiveDateTime": "effectiveDateTime",
+    "value": "valueQuantity.value",
+    "unit": "valueQuantity.unit",
+    "valueString": "valueString",
+    "valueCode": "valueCodeableConcept.text",
+    "patient_ref": "subject.reference",
+    "encounter_ref": "encounter.reference",
+}
+
+MEDICATION_REQUEST_SPEC = {
+    "id": "id",
+    "status": "status",
+    "intent": "intent",
+    "medicationCode": "medicationCodeableConcept.coding.0.code",
+    "medicationDisplay": "medicationCodeableConcept.text",
+    "authoredOn": "authoredOn",
+    "patient_ref": "subject.reference",
+    "encounter_ref": "encounter.reference",
+    "requester_ref": "requester.reference",
+    "reason_ref": "reasonReference.0.reference",
+}
+
+PROCEDURE_SPEC = {
+    "id": "id",
+    "status": "status",
+    "code": "code.coding.0.code",
+    "display": "code.text",
+    "performedStart": "performedPeriod.start",
+    "performedEnd": "performedPeriod.end",
+    "patient_ref": "subject.reference",
+    "encounter_ref": "encounter.reference",
+    "reason_ref": "reasonReference.0.reference",
+}
+
+_extract_patient_fields = _compile_spec(PATIENT_SPEC)
+_extract_extension_display = _compile_spec({"display": "extension.0.valueCoding.display"})
+
+
+def _extract_patient(resource: Dict) -> Dict:
+    """Extract Patient node properties from a FHIR resource"""
+    patient_data = _extract_patient_fields(resource)
+    # Missing names are stored as '' so every patient is in the
+    # patient_lname_fname index the API pages through
+    patient_data["fname"] = patient_data["fname"] or ""
+    patient_data["lname"] = patient_data["lname"] or ""
+    patient_data["race"] = None
+    patient_data["ethnicity"] = None
+    
+    # Extract race and ethnicity from extensions
+    extensions = resource.get("extension", [])
+    for ext in extensions:
+        if "us-core-race" in ext.get("url", ""):
+            patient_data["race"] = _extract_extension_display(ext)["display"]
+        elif "us-core-ethnicity" in ext.get("url", ""):
+            patient_data["ethnicity"] = _extract_extension_display(ext)["display"]
+            
+    return patient_data
+
+
+# Node extractor for each supported resourceType; the resourceType doubles as
+# the node label and the order is the order buckets are written in
+RESOURCE_HANDLERS = {
+    "Patient": _extract_patient,
+    "Practitioner": _compile_spec(PRACTITIONER_SPEC),
+    "Organization": _compile_spec(ORGANIZATION_SPEC),
+    "Encounter": _compile_spec(ENCOUNTER_SPEC),
+    "Condition": _compile_spec(CONDITION_SPEC),
+    "Observation": _compile_spec(OBSERVATION_SPEC),
+    "MedicationRequest": _compile_spec(MEDICATION_REQUEST_SPEC),
+    "Procedure": _compile_spec(PROCEDURE_SPEC),
+}
+
+# Relationships linked while each node row is written, as (target lookup,
+# relationship pattern) pairs. Every target label is written earlier in
+# RESOURCE_HANDLERS order, so references within a bundle always resolve; a
+# target in another file is linked by the create_relationships backfill.
+# Properties are SET after the write, since MERGE cannot match a null
+# property such as a missing onsetDateTime.
+NODE_RELATIONSHIPS = {
+    "Encounter": [
+        ("MATCH (p:Patient {id: row.patient_ref})", "(p)-[:HASENCOUNTER]->(n)"),
+    ],
+    "Condition": [
+        ("MATCH (e:Encounter {id: row.encounter_ref})", "(e)-[:REVEALEDCONDITION]->(n)"),
+        ("MATCH (p:Patient {id: row.patient_ref})", "(p)-[r:HASCONDITION]->(n) SET r.date = n.onsetDateTime"),
+    ],
+    "Observation": [
+        ("MATCH (e:Encounter {id: row.encounter_ref})", "(e)-[:HASOBSERVATION]->(n)"),
+    ],
+    "MedicationRequest": [
+        ("MATCH (c:Condition {id: row.reason_ref})", "(n)-[:TREATMENTFOR]->(c)"),
+        ("MATCH (p:Patient {id: row.patient_ref})", "(p)-[:HASMEDICATION]->(n)"),
+    ],
+    "Procedure": [
+        ("MATCH (c:Condition {id: row.reason_ref})", "(n)-[:PROCEDUREFORTREATMENT]->(c)"),
+        ("MATCH (e:Encounter {id: row.encounter_ref})", "(e)-[:HASPROCEDURE]->(n)"),
+        ("MATCH (p:Patient {id: row.patient_ref})", "(p)-[:HASPROCEDURE]->(n)"),
+    ],
+}
+
+
+def _node_query(label: str, initial_load: bool = False) -> str:
+    """
+    Build the batched UNWIND query writing one label's nodes and their relationships
+    
+    Each relationship runs in its own unit subquery so a row whose target is
+    missing still gets its node and remaining relationships.
+    
+    Args:
+        label: Node label (the FHIR resourceType)
+        initial_load: CREATE nodes and relationships instead of MERGE-ing them
+        
+    Returns:
+        Cypher query reading its input from the $rows parameter
+    """
+    if initial_load:
+        query = f"""
+    UNWIND $rows AS row
+    CREATE (n:{label})
+    SET n = row
+    """
+    else:
+        query = f"""
+    UNWIND $rows AS row
+    MERGE (n:{label} {{id: row.id}})
+    SET n += row
+    """
+    write = "CREATE" if initial_load else "MERGE"
+    for target, pattern in NODE_RELATIONSHIPS.get(label, []):
+        query += f"""WITH n, row
+    CALL {{ WITH n, row {target} {write} {pattern} }}
+    """
+    return query
+
+
+NODE_QUERIES = {label: _node_query(label) for label in RESOURCE_HANDLERS}
+
+# Initial-load variants: CREATE skips the per-row lookup and lock MERGE needs,
+# which is only safe while every node in the bundle is new to the database
+INITIAL_LOAD_QUERIES = {label: _node_query(label, initial_load=True) for label in RESOURCE_HANDLERS}
+
+
+# Schema statements run by create_constraints
+CONSTRAINTS = [
+    "CREATE CONSTRAINT patient_id IF NOT EXISTS FOR (p:Patient) REQUIRE p.id IS UNIQUE",
+    "CREATE CONSTRAINT practitioner_id IF NOT EXISTS FOR (p:Practitioner) REQUIRE p.id IS UNIQUE",
+    "CREATE CONSTRAINT organization_id IF NOT EXISTS FOR (o:Organization) REQUIRE o.id IS UNIQUE",
+    "CREATE CONSTRAINT encounter_id IF NOT EXISTS FOR (e:Encounter) REQUIRE e.id IS UNIQUE",
+    "CREATE CONSTRAINT condition_id IF NOT EXISTS FOR (c:Condition) REQUIRE c.id IS UNIQUE",
+    "CREATE CONSTRAINT observation_id IF NOT EXISTS FOR (o:Observation) REQUIRE o.id IS UNIQUE",
+    "CREATE CONSTRAINT medication_request_id IF NOT EXISTS FOR (m:MedicationRequest) REQUIRE m.id IS UNIQUE",
+    "CREATE CONSTRAINT procedure_id IF NOT EXISTS FOR (pr:Procedure) REQUIRE pr.id IS UNIQUE",
+]
+
+# Reference properties driving the create_relationships backfill, which
+# process_directory runs after the last file; each pass finds its referencing
+# rows through one of these instead of scanning the whole label
+INDEXES = [
+    "CREATE INDEX encounter_patient_ref IF NOT EXISTS FOR (e:Encounter) ON (e.patient_ref)",
+    "CREATE INDEX condition_patient_ref IF NOT EXISTS FOR (c:Condition) ON (c.patient_ref)",
+    "CREATE INDEX condition_encounter_ref IF NOT EXISTS FOR (c:Condition) ON (c.encounter_ref)",
+    "CREATE INDEX observation_encounter_ref IF NOT EXISTS FOR (o:Observation) ON (o.encounter_ref)",
+    "CREATE INDEX medication_request_patient_ref IF NOT EXISTS FOR (m:MedicationRequest) ON (m.patient_ref)",
+    "CREATE INDEX medication_request_reason_ref IF NOT EXISTS FOR (m:MedicationRequest) ON (m.reason_ref)",
+    "CREATE INDEX procedure_patient_ref IF NOT EXISTS FOR (pr:Procedure) ON (pr.patient_ref)",
+    "CREATE INDEX procedure_encounter_ref IF NOT EXISTS FOR (pr:Procedure) ON (pr.encounter_ref)",
+    "CREATE INDEX procedure_reason_ref IF NOT EXISTS FOR (pr:Procedure) ON (pr.reason_ref)",
+]
+
+# Whole-database relationship backfill run by create_relationships. Each pass
+# is driven from the referencing label through its *_ref index and seeks the
+# target by unique id. Like TEMPORAL_QUERY, each pass commits every
+# $batch_size driving rows so a large graph is never rewritten at once.
+RELATIONSHIP_QUERIES = [
+    ("Patient-Encounter", """
+    MATCH (e:Encounter)
+    WHERE e.patient_ref IS NOT NULL
+    CALL {
+        WITH e
+        MATCH (p:Patient {id: e.patient_ref})
+        MERGE (p)-[:HASENCOUNTER]->(e)
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("Encounter-Observation", """
+    MATCH (o:Observation)
+    WHERE o.encounter_ref IS NOT NULL
+    CALL {
+        WITH o
+        MATCH (e:Encounter {id: o.encounter_ref})
+        MERGE (e)-[:HASOBSERVATION]->(o)
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("Encounter-Condition", """
+    MATCH (c:Condition)
+    WHERE c.encounter_ref IS NOT NULL
+    CALL {
+        WITH c
+        MATCH (e:Encounter {id: c.encounter_ref})
+        MERGE (e)-[:REVEALEDCONDITION]->(c)
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("Patient-Condition", """
+    MATCH (c:Condition)
+    WHERE c.patient_ref IS NOT NULL
+    CALL {
+        WITH c
+        MATCH (p:Patient {id: c.patient_ref})
+        MERGE (p)-[r:HASCONDITION]->(c)
+        SET r.date = c.onsetDateTime
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("MedicationRequest-Condition", """
+    MATCH (m:MedicationRequest)
+    WHERE m.reason_ref IS NOT NULL
+    CALL {
+        WITH m
+        MATCH (c:Condition {id: m.reason_ref})
+        MERGE (m)-[:TREATMENTFOR]->(c)
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("Patient-MedicationRequest", """
+    MATCH (m:MedicationRequest)
+    WHERE m.patient_ref IS NOT NULL
+    CALL {
+        WITH m
+        MATCH (p:Patient {id: m.patient_ref})
+        MERGE (p)-[:HASMEDICATION]->(m)
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("Procedure-Condition", """
+    MATCH (pr:Procedure)
+    WHERE pr.reason_ref IS NOT NULL
+    CALL {
+        WITH pr
+        MATCH (c:Condition {id: pr.reason_ref})
+        MERGE (pr)-[:PROCEDUREFORTREATMENT]->(c)
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("Encounter-Procedure", """
+    MATCH (pr:Procedure)
+    WHERE pr.encounter_ref IS NOT NULL
+    CALL {
+        WITH pr
+        MATCH (e:Encounter {id: pr.encounter_ref})
+        MERGE (e)-[:HASPROCEDURE]->(pr)
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """),
+    ("Patient-Procedure", """
+    MATCH (pr:Procedure)
+    WHERE pr.patient_ref IS NOT NULL
+    CALL {
+        WITH pr
+        MATCH (p:Patient {id: pr.patient_ref})
+        MERGE (p)-[:HASPROCEDURE]->(pr)
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """),
+]
+
+# First, latest and next-condition chain for each patient, from a single
+# ordered collection per patient
+TEMPORAL_QUERY = """
+    MATCH (p:Patient)
+    CALL {
+        WITH p
+        MATCH (p)-[:HASCONDITION]->(c:Condition)
+        WITH p, c
+        ORDER BY c.onsetDateTime ASC
+        WITH p, collect(c) AS conditions
+        WITH p, conditions, conditions[0] AS firstCondition, conditions[-1] AS latestCondition
+        MERGE (p)-[:FIRSTCONDITION {date: firstCondition.onsetDateTime}]->(firstCondition)
+        MERGE (p)-[:LATESTCONDITION {date: latestCondition.onsetDateTime}]->(latestCondition)
+        WITH conditions
+        UNWIND range(0, size(conditions) - 2) AS i
+        WITH conditions[i] AS current, conditions[i + 1] AS next
+        MERGE (current)-[:NEXTCONDITION {date: next.onsetDateTime}]->(next)
+    } IN TRANSACTIONS OF $batch_size ROWS
+    """
+
+# Node counts for every label in a single round trip
+SUMMARY_QUERY = " UNION ALL ".join(
+    f"MATCH (n:{label}) RETURN '{label}' as label, count(n) as count" for label in RESOURCE_HANDLERS
+)
+
+
+def _load_bundle(file_path: Path) -> Dict:
+    """
+    Parse a FHIR bundle file straight from a read-only memory map
+    
+    orjson parses the mapped pages in place, so the file contents are never
+    copied into an intermediate bytes object.
+    
+    Args:
+        file_path: Path to the FHIR bundle JSON file
+        
+    Returns:
+        Parsed bundle
+    """
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with memoryview(mapped) as view:
+                return orjson.loads(view)
+
+
 class FHIRGraphBuilder:
     """Build Neo4j graph from FHIR patient data"""
     
-    def __init__(self, uri: str, user: str, password: str):
+    def __init__(
+        self,
+        uri: str,
+        user: str,
+        password: str,
+        database: Optional[str] = None,
+        batch_size: int = 5000,
+        workers: int = 8,
+        stream_threshold: int = 64 * 1024 * 1024,
+        initial_load: bool = False
+    ):
         """
         Initialize the FHIR Graph Builder
         
@@ -22,8 +475,19 @@ class FHIRGraphBuilder:
             uri: Neo4j connection URI
             user: Neo4j username
             password: Neo4j password
+            database: Target database name (None resolves the home database per transaction)
+            batch_size: Maximum rows per UNWIND query and per inner transaction of whole-graph passes
+            workers: Number of files ingested concurrently by process_directory
+            stream_threshold: File size in bytes from which bundles are stream-parsed
+            initial_load: CREATE instead of MERGE bundle nodes; only for loading an
+                empty database where every resource appears in exactly one file
         """
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self.database = database
+        self.batch_size = batch_size
+        self.workers = workers
+        self.stream_threshold = stream_threshold
+        self.node_queries = INITIAL_LOAD_QUERIES if initial_load else NODE_QUERIES
         self.logger = logging.getLogger(__name__)
         
     def close(self):
@@ -37,494 +501,177 @@ class FHIRGraphBuilder:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
         
+    def _execute(
+        self,
+        query: str,
+        routing: RoutingControl = RoutingControl.WRITE,
+        causal: bool = True,
+        **params
+    ) -> List:
+        """
+        Run a standalone query in its own driver-managed transaction
+        
+        Args:
+            query: Cypher query
+            routing: Cluster member the query is routed to
+            causal: Chain the query through the driver's execute_query
+                bookmark manager; pass False for independent writes that
+                no later read has to wait for
+            **params: Query parameters
+            
+        Returns:
+            List of result records
+        """
+        bookmark_manager = self.driver.execute_query_bookmark_manager if causal else None
+        records, _, _ = self.driver.execute_query(
+            query, params,
+            database_=self.database,
+            routing_=routing,
+            bookmark_manager_=bookmark_manager
+        )
+        return records
+        
+    def _run_in_transactions(self, query: str):
+        """
+        Run a CALL { ... } IN TRANSACTIONS query, committing every batch_size rows
+        
+        Such queries manage their own inner transactions, so they must run in
+        an auto-commit transaction rather than through execute_query.
+        
+        Args:
+            query: Cypher query using $batch_size as its transaction size
+        """
+        with self.driver.session(database=self.database) as session:
+            session.run(query, batch_size=self.batch_size).consume()
+            
     def create_constraints(self):
-        """Create unique constraints for all node types"""
-        constraints = [
-            "CREATE CONSTRAINT patient_id IF NOT EXISTS FOR (p:Patient) REQUIRE p.id IS UNIQUE",
-            "CREATE CONSTRAINT practitioner_id IF NOT EXISTS FOR (p:Practitioner) REQUIRE p.id IS UNIQUE",
-            "CREATE CONSTRAINT organization_id IF NOT EXISTS FOR (o:Organization) REQUIRE o.id IS UNIQUE",
-            "CREATE CONSTRAINT encounter_id IF NOT EXISTS FOR (e:Encounter) REQUIRE e.id IS UNIQUE",
-            "CREATE CONSTRAINT condition_id IF NOT EXISTS FOR (c:Condition) REQUIRE c.id IS UNIQUE",
-            "CREATE CONSTRAINT observation_id IF NOT EXISTS FOR (o:Observation) REQUIRE o.id IS UNIQUE",
-            "CREATE CONSTRAINT medication_request_id IF NOT EXISTS FOR (m:MedicationRequest) REQUIRE m.id IS UNIQUE",
-            "CREATE CONSTRAINT procedure_id IF NOT EXISTS FOR (pr:Procedure) REQUIRE pr.id IS UNIQUE",
-        ]
-        
-        with self.driver.session() as session:
-            for constraint in constraints:
-                try:
-                    session.run(constraint)
-                    self.logger.info(f"Created constraint: {constraint.split('FOR')[1].split('REQUIRE')[0].strip()}")
-                except Exception as e:
-                    self.logger.warning(f"Constraint may already exist: {e}")
-                    
+        """Create unique constraints for all node types and indexes on reference properties"""
+        for constraint in CONSTRAINTS:
+            try:
+                self._execute(constraint, causal=False)
+                self.logger.info(f"Created constraint: {constraint.split('FOR')[1].split('REQUIRE')[0].strip()}")
+            except Exception as e:
+                self.logger.warning(f"Constraint may already exist: {e}")
+                
+        for index in INDEXES:
+            try:
+                self._execute(index, causal=False)
+                self.logger.info(f"Created index: {index.split('FOR')[1].strip()}")
+            except Exception as e:
+                self.logger.warning(f"Index may already exist: {e}")
+                
     def clear_database(self):
         """Clear all nodes and relationships from the database"""
-        with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            self.logger.info("Database cleared")
+        self._execute("MATCH (n) DETACH DELETE n", causal=False)
+        self.logger.info("Database cleared")
+        
+    def _bucket_entries(self, entries: Iterable[Dict]) -> Dict[str, List[Dict]]:
+        """
+        Extract node rows from bundle entries in a single pass
+        
+        Args:
+            entries: Bundle entries, either a parsed list or a streaming iterator
             
-    def _safe_get(self, data: Dict, *keys, default=None):
-        """Safely navigate nested dictionary structure"""
-        for key in keys:
-            if isinstance(data, dict):
-                data = data.get(key, {})
-            elif isinstance(data, list) and len(data) > 0:
-                data = data[0] if isinstance(key, int) or key == 0 else data
-            else:
-                return default
-        return data if data != {} else default
-        
-    def create_patient_nodes(self, bundle: Dict):
-        """Create Patient nodes from FHIR bundle"""
-        entries = bundle.get("entry", [])
-        
-        with self.driver.session() as session:
-            for entry in entries:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") != "Patient":
-                    continue
-                    
-                # Extract patient data
-                patient_data = {
-                    "id": resource.get("id"),
-                    "fname": self._safe_get(resource, "name", 0, "given", 0),
-                    "lname": self._safe_get(resource, "name", 0, "family"),
-                    "gender": resource.get("gender"),
-                    "birthDate": resource.get("birthDate"),
-                    "city": self._safe_get(resource, "address", 0, "city"),
-                    "state": self._safe_get(resource, "address", 0, "state"),
-                    "postalCode": self._safe_get(resource, "address", 0, "postalCode"),
-                    "country": self._safe_get(resource, "address", 0, "country"),
-                    "addressLine": self._safe_get(resource, "address", 0, "line", 0),
-                    "maritalStatus": self._safe_get(resource, "maritalStatus", "text"),
-                    "race": None,
-                    "ethnicity": None,
-                }
-                
-                # Extract race and ethnicity from extensions
-                extensions = resource.get("extension", [])
-                for ext in extensions:
-                    if "us-core-race" in ext.get("url", ""):
-                        patient_data["race"] = self._safe_get(ext, "extension", 0, "valueCoding", "display")
-                    elif "us-core-ethnicity" in ext.get("url", ""):
-                        patient_data["ethnicity"] = self._safe_get(ext, "extension", 0, "valueCoding", "display")
-                
-                # Create node
-                query = """
-                MERGE (p:Patient {id: $id})
-                SET p.fname = $fname,
-                    p.lname = $lname,
-                    p.gender = $gender,
-                    p.birthDate = $birthDate,
-                    p.city = $city,
-                    p.state = $state,
-                    p.postalCode = $postalCode,
-                    p.country = $country,
-                    p.addressLine = $addressLine,
-                    p.maritalStatus = $maritalStatus,
-                    p.race = $race,
-                    p.ethnicity = $ethnicity
-                """
-                session.run(query, **patient_data)
-                self.logger.debug(f"Created Patient node: {patient_data['id']}")
-                
-    def create_practitioner_nodes(self, bundle: Dict):
-        """Create Practitioner nodes from FHIR bundle"""
-        entries = bundle.get("entry", [])
-        
-        with self.driver.session() as session:
-            for entry in entries:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") != "Practitioner":
-                    continue
-                    
-                practitioner_data = {
-                    "id": resource.get("id"),
-                    "fname": self._safe_get(resource, "name", 0, "given", 0),
-                    "lname": self._safe_get(resource, "name", 0, "family"),
-                    "gender": resource.get("gender"),
-                    "prefix": self._safe_get(resource, "name", 0, "prefix", 0),
-                }
-                
-                query = """
-                MERGE (pr:Practitioner {id: $id})
-                SET pr.fname = $fname,
-                    pr.lname = $lname,
-                    pr.gender = $gender,
-                    pr.prefix = $prefix
-                """
-                session.run(query, **practitioner_data)
-                self.logger.debug(f"Created Practitioner node: {practitioner_data['id']}")
-                
-    def create_organization_nodes(self, bundle: Dict):
-        """Create Organization nodes from FHIR bundle"""
-        entries = bundle.get("entry", [])
-        
-        with self.driver.session() as session:
-            for entry in entries:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") != "Organization":
-                    continue
-                    
-                org_data = {
-                    "id": resource.get("id"),
-                    "name": resource.get("name"),
-                    "orgtype": self._safe_get(resource, "type", 0, "coding", 0, "display"),
-                    "addressCity": self._safe_get(resource, "address", 0, "city"),
-                    "addressState": self._safe_get(resource, "address", 0, "state"),
-                    "addressLine": self._safe_get(resource, "address", 0, "line", 0),
-                }
-                
-                query = """
-                MERGE (o:Organization {id: $id})
-                SET o.name = $name,
-                    o.orgtype = $orgtype,
-                    o.addressCity = $addressCity,
-                    o.addressState = $addressState,
-                    o.addressLine = $addressLine
-                """
-                session.run(query, **org_data)
-                self.logger.debug(f"Created Organization node: {org_data['id']}")
-                
-    def create_encounter_nodes(self, bundle: Dict):
-        """Create Encounter nodes from FHIR bundle"""
-        entries = bundle.get("entry", [])
-        
-        with self.driver.session() as session:
-            for entry in entries:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") != "Encounter":
-                    continue
-                    
-                encounter_data = {
-                    "id": resource.get("id"),
-                    "status": resource.get("status"),
-                    "class": self._safe_get(resource, "class", "code"),
-                    "type": self._safe_get(resource, "type", 0, "text"),
-                    "encstart": self._safe_get(resource, "period", "start"),
-                    "encend": self._safe_get(resource, "period", "end"),
-                    "patient_ref": self._safe_get(resource, "subject", "reference"),
-                    "provider_ref": self._safe_get(resource, "participant", 0, "individual", "reference"),
-                    "org_ref": self._safe_get(resource, "serviceProvider", "reference"),
-                }
-                
-                query = """
-                MERGE (e:Encounter {id: $id})
-                SET e.status = $status,
-                    e.class = $class,
-                    e.type = $type,
-                    e.encstart = $encstart,
-                    e.encend = $encend,
-                    e.patient_ref = $patient_ref,
-                    e.provider_ref = $provider_ref,
-                    e.org_ref = $org_ref
-                """
-                session.run(query, **encounter_data)
-                self.logger.debug(f"Created Encounter node: {encounter_data['id']}")
-                
-    def create_condition_nodes(self, bundle: Dict):
-        """Create Condition nodes from FHIR bundle"""
-        entries = bundle.get("entry", [])
-        
-        with self.driver.session() as session:
-            for entry in entries:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") != "Condition":
-                    continue
-                    
-                condition_data = {
-                    "id": resource.get("id"),
-                    "clinicalStatus": self._safe_get(resource, "clinicalStatus", "coding", 0, "code"),
-                    "verificationStatus": self._safe_get(resource, "verificationStatus", "coding", 0, "code"),
-                    "code": self._safe_get(resource, "code", "coding", 0, "code"),
-                    "display": self._safe_get(resource, "code", "text"),
-                    "onsetDateTime": resource.get("onsetDateTime"),
-                    "recordedDate": resource.get("recordedDate"),
-                    "patient_ref": self._safe_get(resource, "subject", "reference"),
-                    "encounter_ref": self._safe_get(resource, "encounter", "reference"),
-                }
-                
-                query = """
-                MERGE (c:Condition {id: $id})
-                SET c.clinicalStatus = $clinicalStatus,
-                    c.verificationStatus = $verificationStatus,
-                    c.code = $code,
-                    c.display = $display,
-                    c.onsetDateTime = $onsetDateTime,
-                    c.recordedDate = $recordedDate,
-                    c.patient_ref = $patient_ref,
-                    c.encounter_ref = $encounter_ref
-                """
-                session.run(query, **condition_data)
-                self.logger.debug(f"Created Condition node: {condition_data['id']}")
-                
-    def create_observation_nodes(self, bundle: Dict):
-        """Create Observation nodes from FHIR bundle"""
-        entries = bundle.get("entry", [])
-        
-        with self.driver.session() as session:
-            for entry in entries:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") != "Observation":
-                    continue
-                    
-                observation_data = {
-                    "id": resource.get("id"),
-                    "status": resource.get("status"),
-                    "category": self._safe_get(resource, "category", 0, "coding", 0, "display"),
-                    "code": self._safe_get(resource, "code", "coding", 0, "code"),
-                    "display": self._safe_get(resource, "code", "text"),
-                    "effectiveDateTime": resource.get("effectiveDateTime"),
-                    "value": self._safe_get(resource, "valueQuantity", "value"),
-                    "unit": self._safe_get(resource, "valueQuantity", "unit"),
-                    "valueString": resource.get("valueString"),
-                    "valueCode": self._safe_get(resource, "valueCodeableConcept", "text"),
-                    "patient_ref": self._safe_get(resource, "subject", "reference"),
-                    "encounter_ref": self._safe_get(resource, "encounter", "reference"),
-                }
-                
-                query = """
-                MERGE (o:Observation {id: $id})
-                SET o.status = $status,
-                    o.category = $category,
-                    o.code = $code,
-                    o.display = $display,
-                    o.effectiveDateTime = $effectiveDateTime,
-                    o.value = $value,
-                    o.unit = $unit,
-                    o.valueString = $valueString,
-                    o.valueCode = $valueCode,
-                    o.patient_ref = $patient_ref,
-                    o.encounter_ref = $encounter_ref
-                """
-                session.run(query, **observation_data)
-                self.logger.debug(f"Created Observation node: {observation_data['id']}")
-                
-    def create_medication_request_nodes(self, bundle: Dict):
-        """Create MedicationRequest nodes from FHIR bundle"""
-        entries = bundle.get("entry", [])
-        
-        with self.driver.session() as session:
-            for entry in entries:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") != "MedicationRequest":
-                    continue
-                    
-                med_data = {
-                    "id": resource.get("id"),
-                    "status": resource.get("status"),
-                    "intent": resource.get("intent"),
-                    "medicationCode": self._safe_get(resource, "medicationCodeableConcept", "coding", 0, "code"),
-                    "medicationDisplay": self._safe_get(resource, "medicationCodeableConcept", "text"),
-                    "authoredOn": resource.get("authoredOn"),
-                    "patient_ref": self._safe_get(resource, "subject", "reference"),
-                    "encounter_ref": self._safe_get(resource, "encounter", "reference"),
-                    "requester_ref": self._safe_get(resource, "requester", "reference"),
-                    "reason_ref": self._safe_get(resource, "reasonReference", 0, "reference"),
-                }
-                
-                query = """
-                MERGE (m:MedicationRequest {id: $id})
-                SET m.status = $status,
-                    m.intent = $intent,
-                    m.medicationCode = $medicationCode,
-                    m.medicationDisplay = $medicationDisplay,
-                    m.authoredOn = $authoredOn,
-                    m.patient_ref = $patient_ref,
-                    m.encounter_ref = $encounter_ref,
-                    m.requester_ref = $requester_ref,
-                    m.reason_ref = $reason_ref
-                """
-                session.run(query, **med_data)
-                self.logger.debug(f"Created MedicationRequest node: {med_data['id']}")
-                
-    def create_procedure_nodes(self, bundle: Dict):
-        """Create Procedure nodes from FHIR bundle"""
-        entries = bundle.get("entry", [])
-        
-        with self.driver.session() as session:
-            for entry in entries:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") != "Procedure":
-                    continue
-                    
-                proc_data = {
-                    "id": resource.get("id"),
-                    "status": resource.get("status"),
-                    "code": self._safe_get(resource, "code", "coding", 0, "code"),
-                    "display": self._safe_get(resource, "code", "text"),
-                    "performedStart": self._safe_get(resource, "performedPeriod", "start"),
-                    "performedEnd": self._safe_get(resource, "performedPeriod", "end"),
-                    "patient_ref": self._safe_get(resource, "subject", "reference"),
-                    "encounter_ref": self._safe_get(resource, "encounter", "reference"),
-                    "reason_ref": self._safe_get(resource, "reasonReference", 0, "reference"),
-                }
+        Returns:
+            Dictionary mapping each resourceType to its extracted rows
+        """
+        buckets = {resource_type: [] for resource_type in RESOURCE_HANDLERS}
+        
+        for entry in entries:
+            resource = entry.get("resource", {})
+            resource_type = resource.get("resourceType")
+            handler = RESOURCE_HANDLERS.get(resource_type)
+            if handler is None:
+                continue
                 
-                query = """
-                MERGE (pr:Procedure {id: $id})
-                SET pr.status = $status,
-                    pr.code = $code,
-                    pr.display = $display,
-                    pr.performedStart = $performedStart,
-                    pr.performedEnd = $performedEnd,
-                    pr.patient_ref = $patient_ref,
-                    pr.encounter_ref = $encounter_ref,
-                    pr.reason_ref = $reason_ref
-                """
-                session.run(query, **proc_data)
-                self.logger.debug(f"Created Procedure node: {proc_data['id']}")
+            buckets[resource_type].append(handler(resource))
+            
+        return buckets
+        
+    def _write_bundle(self, tx, buckets: Dict[str, List[Dict]]):
+        """
+        Transaction function writing every bucket of one bundle
+        
+        Each bucket is sent as batched UNWIND queries of at most batch_size
+        rows, all inside the caller's transaction.
+        
+        Args:
+            tx: Managed write transaction
+            buckets: Node rows keyed by resourceType, as built by _bucket_entries
+        """
+        batch_size = self.batch_size
+        for label, rows in buckets.items():
+            query = self.node_queries[label]
+            for start in range(0, len(rows), batch_size):
+                tx.run(query, rows=rows[start:start + batch_size]).consume()
                 
     def create_relationships(self):
-        """Create all relationships between nodes"""
-        with self.driver.session() as session:
-            # Patient to Encounter
-            query = """
-            MATCH (p:Patient), (e:Encounter)
-            WHERE e.patient_ref CONTAINS p.id
-            MERGE (p)-[:HASENCOUNTER]->(e)
-            """
-            result = session.run(query)
-            self.logger.info("Created Patient-Encounter relationships")
-            
-            # Encounter to Observation
-            query = """
-            MATCH (e:Encounter), (o:Observation)
-            WHERE o.encounter_ref CONTAINS e.id
-            MERGE (e)-[:HASOBSERVATION]->(o)
-            """
-            session.run(query)
-            self.logger.info("Created Encounter-Observation relationships")
-            
-            # Encounter to Condition
-            query = """
-            MATCH (e:Encounter), (c:Condition)
-            WHERE c.encounter_ref CONTAINS e.id
-            MERGE (e)-[:REVEALEDCONDITION]->(c)
-            """
-            session.run(query)
-            self.logger.info("Created Encounter-Condition relationships")
-            
-            # Patient to Condition
-            query = """
-            MATCH (p:Patient), (c:Condition)
-            WHERE c.patient_ref CONTAINS p.id
-            MERGE (p)-[:HASCONDITION {date: c.onsetDateTime}]->(c)
-            """
-            session.run(query)
-            self.logger.info("Created Patient-Condition relationships")
-            
-            # MedicationRequest to Condition
-            query = """
-            MATCH (m:MedicationRequest), (c:Condition)
-            WHERE m.reason_ref CONTAINS c.id
-            MERGE (m)-[:TREATMENTFOR]->(c)
-            """
-            session.run(query)
-            self.logger.info("Created MedicationRequest-Condition relationships")
-            
-            # Patient to MedicationRequest
-            query = """
-            MATCH (p:Patient), (m:MedicationRequest)
-            WHERE m.patient_ref CONTAINS p.id
-            MERGE (p)-[:HASMEDICATION]->(m)
-            """
-            session.run(query)
-            self.logger.info("Created Patient-MedicationRequest relationships")
-            
-            # Procedure to Condition
-            query = """
-            MATCH (pr:Procedure), (c:Condition)
-            WHERE pr.reason_ref CONTAINS c.id
-            MERGE (pr)-[:PROCEDUREFORTREATMENT]->(c)
-            """
-            session.run(query)
-            self.logger.info("Created Procedure-Condition relationships")
-            
-            # Procedure to Encounter
-            query = """
-            MATCH (e:Encounter), (pr:Procedure)
-            WHERE pr.encounter_ref CONTAINS e.id
-            MERGE (e)-[:HASPROCEDURE]->(pr)
-            """
-            session.run(query)
-            self.logger.info("Created Encounter-Procedure relationships")
-            
-            # Patient to Procedure
-            query = """
-            MATCH (p:Patient), (pr:Procedure)
-            WHERE pr.patient_ref CONTAINS p.id
-            MERGE (p)-[:HASPROCEDURE]->(pr)
-            """
-            session.run(query)
-            self.logger.info("Created Patient-Procedure relationships")
+        """
+        Create all relationships between nodes across the whole database
+        
+        Relationships are normally linked as each bundle is written. This pass,
+        run by process_directory once every file is in, links references to
+        resources stored in other files.
+        """
+        for name, query in RELATIONSHIP_QUERIES:
+            self._run_in_transactions(query)
+            self.logger.info(f"Created {name} relationships")
             
     def create_temporal_relationships(self):
         """Create temporal relationships for conditions"""
-        with self.driver.session() as session:
-            # First condition for each patient
-            query = """
-            MATCH (p:Patient)-[:HASCONDITION]->(c:Condition)
-            WITH p, c
-            ORDER BY c.onsetDateTime ASC
-            WITH p, collect(c)[0] as firstCondition
-            MERGE (p)-[:FIRSTCONDITION {date: firstCondition.onsetDateTime}]->(firstCondition)
-            """
-            session.run(query)
-            self.logger.info("Created FIRSTCONDITION relationships")
-            
-            # Latest condition for each patient
-            query = """
-            MATCH (p:Patient)-[:HASCONDITION]->(c:Condition)
-            WITH p, c
-            ORDER BY c.onsetDateTime DESC
-            WITH p, collect(c)[0] as latestCondition
-            MERGE (p)-[:LATESTCONDITION {date: latestCondition.onsetDateTime}]->(latestCondition)
-            """
-            session.run(query)
-            self.logger.info("Created LATESTCONDITION relationships")
-            
-            # Next condition temporal chain for each patient
-            query = """
-            MATCH (p:Patient)-[:HASCONDITION]->(c:Condition)
-            WITH p, c
-            ORDER BY c.onsetDateTime ASC
-            WITH p, collect(c) AS conditions
-            UNWIND range(0, size(conditions) - 2) AS i
-            WITH conditions[i] AS current, conditions[i + 1] AS next
-            MERGE (current)-[:NEXTCONDITION {date: next.onsetDateTime}]->(next)
-            """
-            session.run(query)
-            self.logger.info("Created NEXTCONDITION relationships")
-            
-    def process_fhir_bundle(self, file_path: Path):
+        self._run_in_transactions(TEMPORAL_QUERY)
+        self.logger.info("Created FIRSTCONDITION, LATESTCONDITION and NEXTCONDITION relationships")
+        
+    def process_fhir_bundle(self, file_path: Path, session: Optional[Session] = None):
         """
         Process a single FHIR bundle JSON file
         
         Args:
             file_path: Path to the FHIR bundle JSON file
+            session: Open write session to reuse; a new one is opened if omitted
         """
+        if session is None:
+            with self.driver.session(database=self.database) as session:
+                return self.process_fhir_bundle(file_path, session)
+                
         self.logger.info(f"Processing file: {file_path.name}")
         
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                bundle = json.load(f)
+            if file_path.stat().st_size >= self.stream_threshold:
+                # Stream large bundles so only one entry is materialized at a time
+                with open(file_path, 'rb') as f:
+                    buckets = self._bucket_entries(ijson.items(f, "entry.item", use_float=True))
+            else:
+                bundle = _load_bundle(file_path)
+                buckets = self._bucket_entries(bundle.get("entry", []))
                 
-            # Create all node types
-            self.create_patient_nodes(bundle)
-            self.create_practitioner_nodes(bundle)
-            self.create_organization_nodes(bundle)
-            self.create_encounter_nodes(bundle)
-            self.create_condition_nodes(bundle)
-            self.create_observation_nodes(bundle)
-            self.create_medication_request_nodes(bundle)
-            self.create_procedure_nodes(bundle)
+            buckets = {label: rows for label, rows in buckets.items() if rows}
             
+            # Write every node and relationship of the bundle in one transaction
+            session.execute_write(self._write_bundle, buckets)
+            
+            for label, rows in buckets.items():
+                self.logger.debug("Wrote %d %s rows from %s", len(rows), label, file_path.name)
+                
             self.logger.info(f"Successfully processed: {file_path.name}")
             
         except Exception as e:
             self.logger.error(f"Error processing {file_path.name}: {e}")
             
+    def _process_files(self, file_paths: List[Path], progress: Iterator[int], total_files: int):
+        """
+        Process a shard of FHIR bundle files over a single long-lived session
+        
+        Args:
+            file_paths: Files handled by this worker
+            progress: Shared counter numbering processed files across workers
+            total_files: Total number of files being processed
+        """
+        with self.driver.session(database=self.database) as session:
+            for file_path in file_paths:
+                self.process_fhir_bundle(file_path, session)
+                self.logger.info(f"Processed file {next(progress)}/{total_files}")
+                
     def process_directory(self, directory: Path):
         """
         Process all FHIR bundle JSON files in a directory
@@ -537,11 +684,22 @@ class FHIRGraphBuilder:
         
         self.logger.info(f"Found {total_files} JSON files to process")
         
-        for idx, file_path in enumerate(json_files, 1):
-            self.logger.info(f"Processing file {idx}/{total_files}")
-            self.process_fhir_bundle(file_path)
-            
-        self.logger.info("All files processed. Creating relationships...")
+        # Files only MERGE by unique id, so they can be written in any order;
+        # they are sharded across workers that each keep one session open
+        shards = [json_files[i::self.workers] for i in range(self.workers)]
+        progress = count(1)
+        
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(self._process_files, shard, progress, total_files)
+                for shard in shards if shard
+            ]
+            for future in as_completed(futures):
+                future.result()
+                
+        # Links whose target sat in another file, or in a file written later,
+        # found nothing at insert time and are backfilled here
+        self.logger.info("All files processed. Creating cross-file relationships...")
         self.create_relationships()
         
         self.logger.info("Creating temporal relationships...")
@@ -556,14 +714,7 @@ class FHIRGraphBuilder:
         Returns:
             Dictionary with counts of each node type
         """
-        with self.driver.session() as session:
-            summary = {}
-            
-            node_types = ["Patient", "Practitioner", "Organization", "Encounter", 
-                         "Condition", "Observation", "MedicationRequest", "Procedure"]
-            
-            for node_type in node_types:
-                result = session.run(f"MATCH (n:{node_type}) RETURN count(n) as count")
-                summary[node_type] = result.single()["count"]
-                
-            return summary
+        records = self._execute(SUMMARY_QUERY, routing=RoutingControl.READ)
+        counts = {record["label"]: record["count"] for record in records}
+        
+        return {node_type: counts.get(node_type, 0) for node_type in RESOURCE_HANDLERS}
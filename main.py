@@ -27,7 +27,16 @@ def main():
     logger.info("=" * 60)
     
     # Initialize the graph builder
-    with FHIRGraphBuilder(config.NEO4J_URI, config.NEO4J_USER, config.NEO4J_PASSWORD) as builder:
+    with FHIRGraphBuilder(
+        config.NEO4J_URI,
+        config.NEO4J_USER,
+        config.NEO4J_PASSWORD,
+        database=config.NEO4J_DATABASE,
+        batch_size=config.BATCH_SIZE,
+        workers=config.INGEST_WORKERS,
+        stream_threshold=config.STREAM_THRESHOLD,
+        initial_load=config.INITIAL_LOAD
+    ) as builder:
         # Create constraints
         logger.info("Creating database constraints...")
         builder.create_constraints()
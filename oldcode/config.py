@@ -2,10 +2,13 @@
 Configuration settings for FHIR Neo4j Injector
 """
 
+import os
+
 # Neo4j connection settings
 NEO4J_URI = "bolt://localhost:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "Qwaszx12"  # Change this to your actual Neo4j password
+NEO4J_DATABASE = "neo4j"  # Naming the database saves a routing round trip per session
 
 # Application settings
 DATA_DIRECTORY = "data"
@@ -13,4 +16,11 @@ LOG_LEVEL = "INFO"
 
 # Database settings
 CLEAR_DATABASE_ON_START = False  # Set to True if you want to clear database before injection
-CREATE_CONSTRAINTS = True
\ No newline at end of file
+CREATE_CONSTRAINTS = True
+BATCH_SIZE = 1000  # Maximum number of rows written per transaction
+STREAM_THRESHOLD = 64 * 1024 * 1024  # Bundles this large are stream-parsed
+WORKERS = 4  # Number of files injected concurrently
+WRITERS = 4  # Concurrent sessions writing V2 node batches
+POOL_SIZE = max(WORKERS * (WRITERS + 1), (os.cpu_count() or 1) * 2)  # Maximum number of pooled Bolt connections
+ACQ_TIMEOUT = 60.0  # Seconds to wait for a pooled connection
+FETCH_SIZE = 10000  # Records pulled per batch when reading results
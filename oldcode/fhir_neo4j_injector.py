@@ -5,20 +5,116 @@ This module provides functionality to inject FHIR resources into a Neo4j graph d
 It processes FHIR Bundles containing Patient, Encounter, Condition, and Observation resources.
 """
 
-import json
 import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from neo4j import GraphDatabase, Session
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+from neo4j import Driver, GraphDatabase, Session
+import ijson
+import orjson
 import uuid
 
 
+# Patient extensions whose "text" sub-extension holds a property value,
+# keyed by the last path segment of the extension URL
+EXT_MAP = {
+    "us-core-race": "race",
+    "us-core-ethnicity": "ethnicity"
+}
+
+CONSTRAINTS = [
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (p:Patient) REQUIRE p.id IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (e:Encounter) REQUIRE e.id IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (c:Condition) REQUIRE c.id IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (o:Observation) REQUIRE o.id IS UNIQUE"
+]
+
+CLEAR_DATABASE_CYPHER = "MATCH (n) DETACH DELETE n"
+
+PATIENT_MERGE_CYPHER = """
+UNWIND $rows AS row
+MERGE (p:Patient {id: row.id})
+SET p += row.props
+"""
+
+ENCOUNTER_MERGE_CYPHER = """
+UNWIND $rows AS row
+MERGE (e:Encounter {id: row.id})
+SET e += row.props
+WITH e, row
+OPTIONAL MATCH (p:Patient {id: row.patient})
+FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END | MERGE (p)-[:HAS_ENCOUNTER]->(e))
+"""
+
+CONDITION_MERGE_CYPHER = """
+UNWIND $rows AS row
+MERGE (c:Condition {id: row.id})
+SET c += row.props
+WITH c, row
+OPTIONAL MATCH (p:Patient {id: row.patient})
+FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END | MERGE (p)-[:HAS_CONDITION]->(c))
+WITH c, row
+OPTIONAL MATCH (e:Encounter {id: row.encounter})
+FOREACH (_ IN CASE WHEN e IS NULL THEN [] ELSE [1] END | MERGE (e)-[:HAS_CONDITION]->(c))
+"""
+
+OBSERVATION_MERGE_CYPHER = """
+UNWIND $rows AS row
+MERGE (o:Observation {id: row.id})
+SET o += row.props
+WITH o, row
+OPTIONAL MATCH (p:Patient {id: row.patient})
+FOREACH (_ IN CASE WHEN p IS NULL THEN [] ELSE [1] END | MERGE (p)-[:HAS_OBSERVATION]->(o))
+WITH o, row
+OPTIONAL MATCH (e:Encounter {id: row.encounter})
+FOREACH (_ IN CASE WHEN e IS NULL THEN [] ELSE [1] END | MERGE (e)-[:HAS_OBSERVATION]->(o))
+"""
+
+# Ordered so every relationship endpoint exists before it is linked. The
+# {id: row.x} link lookups plan as index seeks once CONSTRAINTS exist, and
+# still run (as scans) when they don't.
+NODE_QUERIES = {
+    "Patient": PATIENT_MERGE_CYPHER,
+    "Encounter": ENCOUNTER_MERGE_CYPHER,
+    "Condition": CONDITION_MERGE_CYPHER,
+    "Observation": OBSERVATION_MERGE_CYPHER
+}
+
+NODE_LABELS = list(NODE_QUERIES)
+RELATIONSHIP_TYPES = ["HAS_ENCOUNTER", "HAS_CONDITION", "HAS_OBSERVATION"]
+
+# Every node and relationship count in one round trip
+SUMMARY_QUERY = (
+    "RETURN {"
+    + ", ".join(f"{label}: count {{ (:{label}) }}" for label in NODE_LABELS)
+    + "} AS nodes, {"
+    + ", ".join(f"{rel_type}: count {{ ()-[:{rel_type}]->() }}" for rel_type in RELATIONSHIP_TYPES)
+    + "} AS relationships"
+)
+
+
+def _non_empty(props: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop empty values, so SET n += props only writes properties the resource has."""
+    return {key: value for key, value in props.items() if value}
+
+
 class FHIRNeo4jInjector:
     """
     Injects FHIR resources into Neo4j database as a knowledge graph.
     """
 
-    def __init__(self, uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password"):
+    # Drivers shared by every injector connecting to the same (uri, user)
+    _drivers: Dict[Tuple[str, str], Driver] = {}
+    _drivers_lock = threading.Lock()
+
+    def __init__(self, uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password",
+                 batch_size: int = 1000, max_connection_pool_size: int = 100, workers: int = 4,
+                 stream_threshold: int = 64 * 1024 * 1024, connection_acquisition_timeout: float = 60.0,
+                 fetch_size: int = 1000):
         """
         Initialize the injector with Neo4j connection parameters.
 
@@ -26,15 +122,58 @@ class FHIRNeo4jInjector:
             uri: Neo4j database URI
             user: Database username
             password: Database password
+            batch_size: Maximum number of rows written per transaction
+            max_connection_pool_size: Maximum number of pooled Bolt connections
+            workers: Number of files injected concurrently by inject_from_directory
+            stream_threshold: File size in bytes from which bundles are stream-parsed
+            connection_acquisition_timeout: Seconds to wait for a pooled connection
+            fetch_size: Records pulled per batch when reading results
+
+        The driver settings apply when the first injector for this uri and
+        user creates the driver.
         """
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        key = (uri, user)
+        with self._drivers_lock:
+            driver = self._drivers.get(key)
+            if driver is None:
+                driver = self._drivers[key] = GraphDatabase.driver(
+                    uri,
+                    auth=(user, password),
+                    max_connection_pool_size=max_connection_pool_size,
+                    connection_acquisition_timeout=connection_acquisition_timeout,
+                    fetch_size=fetch_size,
+                    keep_alive=True
+                )
+        self.driver = driver
+        self.batch_size = batch_size
+        self.workers = workers
+        self.stream_threshold = stream_threshold
         self.logger = logging.getLogger(__name__)
+        self._session: Optional[Session] = None
+
+    @property
+    def session(self) -> Session:
+        """Session shared by every operation of this injector, opened on first use."""
+        if self._session is None:
+            self._session = self.driver.session()
+        return self._session
 
     def close(self):
-        """Close the database connection."""
-        self.driver.close()
+        """Close the shared session; the cached driver stays open for other injectors."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    @classmethod
+    def shutdown_all(cls):
+        """Close every cached driver and its connection pool."""
+        with cls._drivers_lock:
+            for driver in cls._drivers.values():
+                driver.close()
+            cls._drivers.clear()
 
     def __enter__(self):
+        self.session  # Open the shared session up front
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -42,26 +181,17 @@ class FHIRNeo4jInjector:
 
     def clear_database(self):
         """Clear all nodes and relationships from the database."""
-        with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            self.logger.info("Database cleared")
+        self.session.run(CLEAR_DATABASE_CYPHER).consume()
+        self.logger.info("Database cleared")
 
     def create_constraints(self):
         """Create uniqueness constraints for better performance."""
-        constraints = [
-            "CREATE CONSTRAINT IF NOT EXISTS FOR (p:Patient) REQUIRE p.id IS UNIQUE",
-            "CREATE CONSTRAINT IF NOT EXISTS FOR (e:Encounter) REQUIRE e.id IS UNIQUE",
-            "CREATE CONSTRAINT IF NOT EXISTS FOR (c:Condition) REQUIRE c.id IS UNIQUE",
-            "CREATE CONSTRAINT IF NOT EXISTS FOR (o:Observation) REQUIRE o.id IS UNIQUE"
-        ]
-
-        with self.driver.session() as session:
-            for constraint in constraints:
-                try:
-                    session.run(constraint)
-                    self.logger.info(f"Created constraint: {constraint}")
-                except Exception as e:
-                    self.logger.warning(f"Constraint already exists or failed: {e}")
+        for constraint in CONSTRAINTS:
+            try:
+                self.session.run(constraint).consume()
+                self.logger.info(f"Created constraint: {constraint}")
+            except Exception as e:
+                self.logger.warning(f"Constraint already exists or failed: {e}")
 
     def extract_name(self, name_list: List[Dict]) -> str:
         """Extract human-readable name from FHIR name structure."""
@@ -104,12 +234,18 @@ class FHIRNeo4jInjector:
             return ""
         return coding_list[0].get("display", "")
 
-    def inject_patient(self, session: Session, patient: Dict[str, Any]):
-        """Inject a Patient resource into Neo4j."""
-        patient_id = patient.get("id")
-        if not patient_id:
-            self.logger.warning("Patient missing ID, skipping")
-            return
+    def _first_coding_display(self, container: Dict[str, Any], key: str) -> str:
+        """Extract display text from a CodeableConcept field, or the first of a list of them."""
+        concept = container.get(key)
+        if isinstance(concept, list):
+            concept = concept[0] if concept else None
+        if not concept:
+            return ""
+        return self.extract_coding_display(concept.get("coding"))
+
+    def patient_row(self, patient: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the batch row for a Patient resource, already checked to have an ID."""
+        patient_id = patient["id"]
 
         # Extract basic patient information
         name = self.extract_name(patient.get("name", []))
@@ -124,74 +260,51 @@ class FHIRNeo4jInjector:
 
         # Extract extensions for additional data
         extensions = patient.get("extension", [])
-        race = ""
-        ethnicity = ""
+        text_values = {"race": "", "ethnicity": ""}
         birth_place = {}
 
         for ext in extensions:
-            url = ext.get("url", "")
-            if "us-core-race" in url:
-                for sub_ext in ext.get("extension", []):
-                    if sub_ext.get("url") == "text":
-                        race = sub_ext.get("valueString", "")
-            elif "us-core-ethnicity" in url:
+            slug = ext.get("url", "").rpartition("/")[2]
+            field = EXT_MAP.get(slug)
+            if field is not None:
                 for sub_ext in ext.get("extension", []):
                     if sub_ext.get("url") == "text":
-                        ethnicity = sub_ext.get("valueString", "")
-            elif "patient-birthPlace" in url:
+                        text_values[field] = sub_ext.get("valueString", "")
+            elif slug == "patient-birthPlace":
                 birth_place = ext.get("valueAddress", {})
 
-        # Create patient node
-        query = """
-        MERGE (p:Patient {id: $patient_id})
-        SET p.name = $name,
-            p.gender = $gender,
-            p.birthDate = $birth_date,
-            p.race = $race,
-            p.ethnicity = $ethnicity,
-            p.addressLine = $address_line,
-            p.city = $city,
-            p.state = $state,
-            p.postalCode = $postal_code,
-            p.country = $country,
-            p.phone = $phone,
-            p.email = $email,
-            p.birthPlaceCity = $birth_place_city,
-            p.birthPlaceState = $birth_place_state,
-            p.birthPlaceCountry = $birth_place_country
-        """
+        row = {
+            "id": patient_id,
+            "props": _non_empty({
+                "name": name,
+                "gender": gender,
+                "birthDate": birth_date,
+                "race": text_values["race"],
+                "ethnicity": text_values["ethnicity"],
+                "addressLine": address.get("line", ""),
+                "city": address.get("city", ""),
+                "state": address.get("state", ""),
+                "postalCode": address.get("postalCode", ""),
+                "country": address.get("country", ""),
+                "phone": telecom.get("phone", ""),
+                "email": telecom.get("email", ""),
+                "birthPlaceCity": birth_place.get("city", ""),
+                "birthPlaceState": birth_place.get("state", ""),
+                "birthPlaceCountry": birth_place.get("country", "")
+            })
+        }
+
+        self.logger.debug("Prepared Patient: %s (ID: %s)", name, patient_id)
+        return row
 
-        session.run(query, {
-            "patient_id": patient_id,
-            "name": name,
-            "gender": gender,
-            "birth_date": birth_date,
-            "race": race,
-            "ethnicity": ethnicity,
-            "address_line": address.get("line", ""),
-            "city": address.get("city", ""),
-            "state": address.get("state", ""),
-            "postal_code": address.get("postalCode", ""),
-            "country": address.get("country", ""),
-            "phone": telecom.get("phone", ""),
-            "email": telecom.get("email", ""),
-            "birth_place_city": birth_place.get("city", ""),
-            "birth_place_state": birth_place.get("state", ""),
-            "birth_place_country": birth_place.get("country", "")
-        })
-
-        self.logger.info(f"Injected Patient: {name} (ID: {patient_id})")
-
-    def inject_encounter(self, session: Session, encounter: Dict[str, Any]):
-        """Inject an Encounter resource into Neo4j."""
-        encounter_id = encounter.get("id")
-        if not encounter_id:
-            return
+    def encounter_row(self, encounter: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the batch row for an Encounter resource, already checked to have an ID."""
+        encounter_id = encounter["id"]
 
         # Extract encounter information
         status = encounter.get("status", "")
         encounter_class = encounter.get("class", {}).get("display", "")
-        encounter_type = self.extract_coding_display(encounter.get("type", [{}])[0].get("coding", []))
+        encounter_type = self._first_coding_display(encounter, "type")
 
         # Extract period
         period = encounter.get("period", {})
@@ -200,50 +313,30 @@ class FHIRNeo4jInjector:
 
         # Extract patient reference
         subject = encounter.get("subject", {})
-        patient_id = subject.get("reference", "").replace("urn:uuid:", "")
-
-        # Create encounter node
-        query = """
-        MERGE (e:Encounter {id: $encounter_id})
-        SET e.status = $status,
-            e.class = $encounter_class,
-            e.type = $encounter_type,
-            e.start = $start,
-            e.end = $end
-        """
-
-        session.run(query, {
-            "encounter_id": encounter_id,
-            "status": status,
-            "encounter_class": encounter_class,
-            "encounter_type": encounter_type,
-            "start": start,
-            "end": end
-        })
-
-        # Link to patient
-        if patient_id:
-            link_query = """
-            MATCH (p:Patient {id: $patient_id})
-            MATCH (e:Encounter {id: $encounter_id})
-            MERGE (p)-[:HAS_ENCOUNTER]->(e)
-            """
-            session.run(link_query, {
-                "patient_id": patient_id,
-                "encounter_id": encounter_id
-            })
+        patient_id = subject.get("reference", "").removeprefix("urn:uuid:")
+
+        row = {
+            "id": encounter_id,
+            "props": _non_empty({
+                "status": status,
+                "class": encounter_class,
+                "type": encounter_type,
+                "start": start,
+                "end": end
+            }),
+            "patient": patient_id or None
+        }
 
-        self.logger.info(f"Injected Encounter: {encounter_type} (ID: {encounter_id})")
+        self.logger.debug("Prepared Encounter: %s (ID: %s)", encounter_type, encounter_id)
+        return row
 
-    def inject_condition(self, session: Session, condition: Dict[str, Any]):
-        """Inject a Condition resource into Neo4j."""
-        condition_id = condition.get("id")
-        if not condition_id:
-            return
+    def condition_row(self, condition: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the batch row for a Condition resource, already checked to have an ID."""
+        condition_id = condition["id"]
 
         # Extract condition information
-        clinical_status = condition.get("clinicalStatus", {}).get("coding", [{}])[0].get("display", "")
-        verification_status = condition.get("verificationStatus", {}).get("coding", [{}])[0].get("display", "")
+        clinical_status = self._first_coding_display(condition, "clinicalStatus")
+        verification_status = self._first_coding_display(condition, "verificationStatus")
 
         # Extract condition code
         code_info = condition.get("code", {})
@@ -260,63 +353,31 @@ class FHIRNeo4jInjector:
 
         # Extract references
         subject = condition.get("subject", {})
-        patient_id = subject.get("reference", "").replace("urn:uuid:", "")
+        patient_id = subject.get("reference", "").removeprefix("urn:uuid:")
 
         encounter = condition.get("encounter", {})
-        encounter_id = encounter.get("reference", "").replace("urn:uuid:", "")
-
-        # Create condition node
-        query = """
-        MERGE (c:Condition {id: $condition_id})
-        SET c.clinicalStatus = $clinical_status,
-            c.verificationStatus = $verification_status,
-            c.code = $condition_code,
-            c.display = $condition_display,
-            c.onsetDateTime = $onset_datetime,
-            c.recordedDate = $recorded_date
-        """
-
-        session.run(query, {
-            "condition_id": condition_id,
-            "clinical_status": clinical_status,
-            "verification_status": verification_status,
-            "condition_code": condition_code,
-            "condition_display": condition_display,
-            "onset_datetime": onset_datetime,
-            "recorded_date": recorded_date
-        })
-
-        # Link to patient
-        if patient_id:
-            link_query = """
-            MATCH (p:Patient {id: $patient_id})
-            MATCH (c:Condition {id: $condition_id})
-            MERGE (p)-[:HAS_CONDITION]->(c)
-            """
-            session.run(link_query, {
-                "patient_id": patient_id,
-                "condition_id": condition_id
-            })
-
-        # Link to encounter
-        if encounter_id:
-            link_query = """
-            MATCH (e:Encounter {id: $encounter_id})
-            MATCH (c:Condition {id: $condition_id})
-            MERGE (e)-[:HAS_CONDITION]->(c)
-            """
-            session.run(link_query, {
-                "encounter_id": encounter_id,
-                "condition_id": condition_id
-            })
+        encounter_id = encounter.get("reference", "").removeprefix("urn:uuid:")
+
+        row = {
+            "id": condition_id,
+            "props": _non_empty({
+                "clinicalStatus": clinical_status,
+                "verificationStatus": verification_status,
+                "code": condition_code,
+                "display": condition_display,
+                "onsetDateTime": onset_datetime,
+                "recordedDate": recorded_date
+            }),
+            "patient": patient_id or None,
+            "encounter": encounter_id or None
+        }
 
-        self.logger.info(f"Injected Condition: {condition_display} (ID: {condition_id})")
+        self.logger.debug("Prepared Condition: %s (ID: %s)", condition_display, condition_id)
+        return row
 
-    def inject_observation(self, session: Session, observation: Dict[str, Any]):
-        """Inject an Observation resource into Neo4j."""
-        observation_id = observation.get("id")
-        if not observation_id:
-            return
+    def observation_row(self, observation: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the batch row for an Observation resource, already checked to have an ID."""
+        observation_id = observation["id"]
 
         # Extract observation information
         status = observation.get("status", "")
@@ -350,118 +411,171 @@ class FHIRNeo4jInjector:
 
         # Extract references
         subject = observation.get("subject", {})
-        patient_id = subject.get("reference", "").replace("urn:uuid:", "")
+        patient_id = subject.get("reference", "").removeprefix("urn:uuid:")
 
         encounter = observation.get("encounter", {})
-        encounter_id = encounter.get("reference", "").replace("urn:uuid:", "")
-
-        # Create observation node
-        query = """
-        MERGE (o:Observation {id: $observation_id})
-        SET o.status = $status,
-            o.code = $observation_code,
-            o.display = $observation_display,
-            o.value = $value,
-            o.unit = $value_unit,
-            o.effectiveDateTime = $effective_datetime,
-            o.issued = $issued
+        encounter_id = encounter.get("reference", "").removeprefix("urn:uuid:")
+
+        row = {
+            "id": observation_id,
+            "props": _non_empty({
+                "status": status,
+                "code": observation_code,
+                "display": observation_display,
+                "value": value,
+                "unit": value_unit,
+                "effectiveDateTime": effective_datetime,
+                "issued": issued
+            }),
+            "patient": patient_id or None,
+            "encounter": encounter_id or None
+        }
+
+        self.logger.debug("Prepared Observation: %s (ID: %s)", observation_display, observation_id)
+        return row
+
+    def _run_in_batches(self, session: Session, query: str, rows: List[Dict[str, Any]]):
         """
+        Run an UNWIND query over rows, committing one transaction per batch_size rows.
 
-        session.run(query, {
-            "observation_id": observation_id,
-            "status": status,
-            "observation_code": observation_code,
-            "observation_display": observation_display,
-            "value": value,
-            "value_unit": value_unit,
-            "effective_datetime": effective_datetime,
-            "issued": issued
-        })
-
-        # Link to patient
-        if patient_id:
-            link_query = """
-            MATCH (p:Patient {id: $patient_id})
-            MATCH (o:Observation {id: $observation_id})
-            MERGE (p)-[:HAS_OBSERVATION]->(o)
-            """
-            session.run(link_query, {
-                "patient_id": patient_id,
-                "observation_id": observation_id
-            })
+        Each batch is a managed write transaction, so the driver retries it on
+        transient errors such as a deadlock with another file merging the same
+        Patient or Encounter nodes.
 
-        # Link to encounter
-        if encounter_id:
-            link_query = """
-            MATCH (e:Encounter {id: $encounter_id})
-            MATCH (o:Observation {id: $observation_id})
-            MERGE (e)-[:HAS_OBSERVATION]->(o)
-            """
-            session.run(link_query, {
-                "encounter_id": encounter_id,
-                "observation_id": observation_id
-            })
+        Args:
+            session: Open Neo4j session
+            query: Cypher query unwinding $rows
+            rows: Parameter rows for the query
+        """
+        for i in range(0, len(rows), self.batch_size):
+            chunk = rows[i:i + self.batch_size]
+            session.execute_write(lambda tx: tx.run(query, rows=chunk).consume())
+
+    def write_batch(self, session: Session, batch: Dict[str, List]):
+        """
+        Write queued resources with one UNWIND query per type.
+
+        Each query merges the nodes and their links to the referenced Patient
+        and Encounter in the same statement.
 
-        self.logger.info(f"Injected Observation: {observation_display} (ID: {observation_id})")
+        Args:
+            session: Open Neo4j session
+            batch: Rows keyed by node label
+        """
+        for label, query in NODE_QUERIES.items():
+            rows = batch.get(label)
+            if rows:
+                try:
+                    self._run_in_batches(session, query, rows)
+                except Exception as e:
+                    self.logger.error(
+                        f"Error injecting batch of {len(rows)} {label} resources "
+                        f"(IDs {rows[0]['id']} to {rows[-1]['id']}): {e}"
+                    )
+                    raise
 
-    def inject_fhir_bundle(self, bundle_data: Dict[str, Any]):
+    def inject_fhir_bundle(self, bundle_data: Dict[str, Any], session: Optional[Session] = None):
         """
         Inject a complete FHIR Bundle into Neo4j.
 
         Args:
             bundle_data: Parsed FHIR Bundle JSON
+            session: Session to write with, defaults to the shared session
         """
         if bundle_data.get("resourceType") != "Bundle":
             raise ValueError("Input data is not a FHIR Bundle")
 
-        entries = bundle_data.get("entry", [])
+        self.inject_entries(bundle_data.get("entry", []), session)
+
+    def inject_entries(self, entries: Iterable[Dict[str, Any]], session: Optional[Session] = None):
+        """
+        Inject FHIR Bundle entries into Neo4j, writing every batch_size entries.
+
+        Args:
+            entries: Bundle entries, e.g. streamed from a file
+            session: Session to write with, defaults to the shared session
+        """
+        session = session or self.session
+        entries = iter(entries)
 
         # Count resources by type
-        resource_counts = {}
+        resource_counts = Counter()
 
-        with self.driver.session() as session:
-            # First pass: inject all resources
-            for entry in entries:
-                resource = entry.get("resource", {})
-                resource_type = resource.get("resourceType")
+        row_builders = {
+            "Patient": self.patient_row,
+            "Encounter": self.encounter_row,
+            "Condition": self.condition_row,
+            "Observation": self.observation_row
+        }
+
+        while True:
+            chunk = list(islice(entries, self.batch_size))
+            if not chunk:
+                break
+
+            # Group resources by type in one pass, so each builder runs over its own list
+            groups = {resource_type: [] for resource_type in row_builders}
+
+            resources = [entry.get("resource", {}) for entry in chunk]
+            resource_counts.update(resource.get("resourceType") for resource in resources)
 
-                if not resource_type:
+            for resource in resources:
+                resource_type = resource.get("resourceType")
+                group = groups.get(resource_type)
+                if group is None:
                     continue
 
-                resource_counts[resource_type] = resource_counts.get(resource_type, 0) + 1
+                # Validate up front, so the builders only ever see resources they can write
+                if resource.get("id"):
+                    group.append(resource)
+                else:
+                    self.logger.warning(f"{resource_type} missing ID, skipping")
 
-                try:
-                    if resource_type == "Patient":
-                        self.inject_patient(session, resource)
-                    elif resource_type == "Encounter":
-                        self.inject_encounter(session, resource)
-                    elif resource_type == "Condition":
-                        self.inject_condition(session, resource)
-                    elif resource_type == "Observation":
-                        self.inject_observation(session, resource)
-                    else:
-                        self.logger.info(f"Skipping unsupported resource type: {resource_type}")
+            # Rows collected per type, written once per chunk; the builder is
+            # bound to a local so the comprehension skips the attribute lookup
+            batch = {}
 
-                except Exception as e:
-                    self.logger.error(f"Error injecting {resource_type} resource: {e}")
+            for resource_type, resources in groups.items():
+                build_row = row_builders[resource_type]
+                batch[resource_type] = [build_row(resource) for resource in resources]
+
+            self.write_batch(session, batch)
+
+        # Entries without a resourceType are not counted
+        resource_counts.pop(None, None)
+
+        for resource_type, count in resource_counts.items():
+            if resource_type not in row_builders:
+                self.logger.info(f"Skipping unsupported resource type: {resource_type} ({count} resources)")
 
         # Log summary
         self.logger.info("FHIR Bundle injection completed:")
         for resource_type, count in resource_counts.items():
             self.logger.info(f"  {resource_type}: {count} resources")
 
-    def inject_from_file(self, file_path: str):
+    def inject_from_file(self, file_path: str, session: Optional[Session] = None):
         """
-        Load and inject FHIR Bundle from a JSON file.
+        Load and inject a FHIR Bundle from a JSON file.
+
+        Files of at least stream_threshold bytes are streamed entry by entry,
+        so memory use is bounded by batch_size rather than by the size of the
+        file; smaller files are parsed in one call with orjson.
 
         Args:
             file_path: Path to the FHIR Bundle JSON file
+            session: Session to write with, defaults to the shared session
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                bundle_data = json.load(f)
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < self.stream_threshold:
+                    self.inject_fhir_bundle(orjson.loads(f.read()), session)
+                else:
+                    if next(ijson.items(f, "resourceType"), None) != "Bundle":
+                        raise ValueError("Input data is not a FHIR Bundle")
+
+                    f.seek(0)
+                    self.inject_entries(ijson.items(f, "entry.item", use_float=True), session)
 
-            self.inject_fhir_bundle(bundle_data)
             self.logger.info(f"Successfully processed file: {file_path}")
 
         except Exception as e:
@@ -480,46 +594,39 @@ class FHIRNeo4jInjector:
         if not data_dir.exists():
             raise FileNotFoundError(f"Directory not found: {directory_path}")
 
-        json_files = list(data_dir.glob("*.json"))
+        # Iterated lazily so injection starts while the directory is still being listed
+        json_files = (path for path in data_dir.iterdir() if path.suffix == ".json")
 
-        if not json_files:
-            self.logger.warning(f"No JSON files found in {directory_path}")
-            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._inject_file_in_own_session, str(json_file)): json_file
+                       for json_file in json_files}
 
-        self.logger.info(f"Found {len(json_files)} JSON files to process")
-
-        for json_file in json_files:
-            try:
-                self.inject_from_file(str(json_file))
-            except Exception as e:
-                self.logger.error(f"Failed to process {json_file}: {e}")
-                continue
+            if not futures:
+                self.logger.warning(f"No JSON files found in {directory_path}")
+                return
 
-    def get_database_summary(self) -> Dict[str, int]:
-        """Get a summary of nodes and relationships in the database."""
-        with self.driver.session() as session:
-            # Count nodes by label
-            node_counts = {}
-            labels = ["Patient", "Encounter", "Condition", "Observation"]
+            self.logger.info(f"Found {len(futures)} JSON files to process")
 
-            for label in labels:
-                result = session.run(f"MATCH (n:{label}) RETURN count(n) as count")
-                count = result.single()["count"]
-                node_counts[label] = count
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    self.logger.error(f"Failed to process {futures[future]}: {e}")
 
-            # Count relationships
-            relationship_counts = {}
-            rel_types = ["HAS_ENCOUNTER", "HAS_CONDITION", "HAS_OBSERVATION"]
+    def _inject_file_in_own_session(self, file_path: str):
+        """Inject a file from a worker thread; sessions are not thread-safe, so each file gets its own."""
+        with self.driver.session() as session:
+            self.inject_from_file(file_path, session)
 
-            for rel_type in rel_types:
-                result = session.run(f"MATCH ()-[r:{rel_type}]->() RETURN count(r) as count")
-                count = result.single()["count"]
-                relationship_counts[rel_type] = count
+    def get_database_summary(self) -> Dict[str, int]:
+        """Get a summary of nodes and relationships in the database."""
+        record = self.session.run(SUMMARY_QUERY).single()
 
-            return {
-                "nodes": node_counts,
-                "relationships": relationship_counts
-            }
+        # Cypher maps are unordered, so rebuild them in display order
+        return {
+            "nodes": {label: record["nodes"][label] for label in NODE_LABELS},
+            "relationships": {rel_type: record["relationships"][rel_type] for rel_type in RELATIONSHIP_TYPES}
+        }
 
 
 def main():
@@ -533,7 +640,13 @@ def main():
     )
 
     try:
-        with FHIRNeo4jInjector(config.NEO4J_URI, config.NEO4J_USER, config.NEO4J_PASSWORD) as injector:
+        with FHIRNeo4jInjector(config.NEO4J_URI, config.NEO4J_USER, config.NEO4J_PASSWORD,
+                               batch_size=config.BATCH_SIZE,
+                               max_connection_pool_size=config.POOL_SIZE,
+                               workers=config.WORKERS,
+                               stream_threshold=config.STREAM_THRESHOLD,
+                               connection_acquisition_timeout=config.ACQ_TIMEOUT,
+                               fetch_size=config.FETCH_SIZE) as injector:
             # Create constraints for better performance
             if config.CREATE_CONSTRAINTS:
                 injector.create_constraints()
@@ -558,6 +671,8 @@ def main():
     except Exception as e:
         logging.error(f"Application error: {e}")
         raise
+    finally:
+        FHIRNeo4jInjector.shutdown_all()
 
 
 if __name__ == "__main__":
@@ -2,34 +2,402 @@
 FHIR to Neo4j Graph Injector (Version 2)
 
 Updated implementation following the reference tutorial pattern with:
-- Two-phase approach: nodes first, then relationships
+- Two-phase approach: nodes with their basic links first, then temporal relationships
 - Support for more FHIR resource types
 - Temporal relationship creation
 - Improved data extraction patterns
 """
 
-import json
+import asyncio
 import logging
+import mmap
+import os
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from functools import lru_cache, partial
+from itertools import groupby, islice
+from operator import itemgetter
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from neo4j import GraphDatabase, Session
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
+from neo4j import (AsyncDriver, AsyncGraphDatabase, AsyncManagedTransaction, Driver, GraphDatabase,
+                   ManagedTransaction, Record, ResultSummary, Session)
+import ijson
+import orjson
 from datetime import datetime
 
 
+# Patient extensions copied to node properties, keyed by the last segment of their URL
+EXT_MAP = {
+    "us-core-race": "race",
+    "us-core-ethnicity": "ethnicity"
+}
+
+CONSTRAINTS = [
+    "CREATE CONSTRAINT pid FOR (p:Patient) REQUIRE p.id IS UNIQUE",
+    "CREATE CONSTRAINT prid FOR (pr:Practitioner) REQUIRE pr.id IS UNIQUE",
+    "CREATE CONSTRAINT oid FOR (o:Organization) REQUIRE o.id IS UNIQUE",
+    "CREATE CONSTRAINT eid FOR (e:Encounter) REQUIRE e.id IS UNIQUE",
+    "CREATE CONSTRAINT cid FOR (c:Condition) REQUIRE c.id IS UNIQUE",
+    "CREATE CONSTRAINT obsid FOR (obs:Observation) REQUIRE obs.id IS UNIQUE",
+    "CREATE CONSTRAINT mrid FOR (mr:MedicationRequest) REQUIRE mr.id IS UNIQUE",
+    "CREATE CONSTRAINT procid FOR (proc:Procedure) REQUIRE proc.id IS UNIQUE"
+]
+
+# Full-text indexes over the type, so sample queries searching by condition or
+# observation name seek the index instead of scanning every node. The standard
+# analyzer lowercases at index and query time, so no lowercased copy is stored
+FULLTEXT_INDEXES = [
+    "CREATE FULLTEXT INDEX condition_type_ft IF NOT EXISTS FOR (c:Condition) ON EACH [c.type]",
+    "CREATE FULLTEXT INDEX observation_type_ft IF NOT EXISTS FOR (obs:Observation) ON EACH [obs.type]"
+]
+
+CLEAR_DATABASE_CYPHER = "MATCH (n) DETACH DELETE n"
+
+
+def _link_clause(var: str, label: str, key: str, pattern: str) -> str:
+    """Cypher linking each merged node n to the `label` node whose id is row[key], if it exists."""
+    return f"""
+    WITH n, row
+    OPTIONAL MATCH ({var}:{label} {{id: row.{key}}})
+    FOREACH (_ IN CASE WHEN {var} IS NULL THEN [] ELSE [1] END | MERGE {pattern})"""
+
+
+def _merge_query(label: str, *links: str) -> str:
+    """UNWIND query merging `label` nodes on id, then running the given link clauses."""
+    return f"UNWIND $rows AS row MERGE (n:{label} {{id: row.id}}) SET n += row" + "".join(links)
+
+
+# Parent links of each child label: (variable, parent label, row key, MERGE pattern)
+NODE_LINKS = {
+    "Encounter": (("p", "Patient", "pid", "(p)-[:HASENCOUNTER]->(n)"),),
+    "Condition": (
+        ("p", "Patient", "pid", "(p)-[:HASCONDITION]->(n)"),
+        ("e", "Encounter", "encref", "(e)-[:HASCONDITION]->(n)")
+    ),
+    "Observation": (("e", "Encounter", "encid", "(e)-[:HASOBSERVATION]->(n)"),),
+    "Procedure": (("p", "Patient", "pid", "(p)-[:HASPROCEDURE]->(n)"),),
+    "MedicationRequest": (
+        ("p", "Patient", "pid", "(p)-[:HASMEDICATION]->(n)"),
+        ("c", "Condition", "reasonid", "(n)-[:TREATMENTFOR]->(c)")
+    ),
+}
+
+# Phase 1 UNWIND queries by label. Nodes and links are merged, so re-injecting
+# a bundle updates it in place; child nodes are linked to their parents in the
+# same statement, through the parent's uniqueness-constraint index.
+NODE_CREATE_QUERIES = {
+    label: _merge_query(label, *(_link_clause(*link) for link in NODE_LINKS.get(label, ())))
+    for label in ("Patient", "Practitioner", "Organization", "Encounter",
+                  "Condition", "Observation", "Procedure", "MedicationRequest")
+}
+
+# Link-only queries for child nodes written before their parent, used by the
+# streaming path once the whole bundle has been read
+NODE_LINK_QUERIES = {
+    label: f"UNWIND $rows AS row MATCH (n:{label} {{id: row.id}})"
+           + "".join(_link_clause(*link) for link in links)
+    for label, links in NODE_LINKS.items()
+}
+
+# Node labels grouped so that every label only links to labels of earlier waves
+CREATION_WAVES = (
+    ("Patient", "Practitioner", "Organization"),
+    ("Encounter",),
+    ("Condition", "Observation", "Procedure"),
+    ("MedicationRequest",),
+)
+
+# Phase 2 UNWIND queries for the condition timeline worked out by create_temporal_relationships.
+# They also store each condition's position in its patient's timeline (chain_index)
+# and the type of the condition after it (chain_next_type), so queries over the
+# timeline can read them instead of walking NEXTCONDITION paths.
+# The timeline is built from one bundle's conditions, so each bundle is assumed
+# to hold its patients' complete history, as Synthea's one-patient files do. A
+# reloaded bundle replaces the patient's FIRST/LATEST edges rather than adding
+# a second one.
+FIRST_CONDITION_QUERY = """
+UNWIND $rows AS row
+MATCH (p:Patient {id: row.pid})
+MATCH (c:Condition {id: row.cid})
+CALL {
+    WITH p, c
+    MATCH (p)-[old:FIRSTCONDITION]->(other)
+    WHERE other <> c
+    DELETE old
+}
+MERGE (p)-[r:FIRSTCONDITION]->(c)
+SET c.chain_index = 0
+"""
+
+LATEST_CONDITION_QUERY = """
+UNWIND $rows AS row
+MATCH (p:Patient {id: row.pid})
+MATCH (c:Condition {id: row.cid})
+CALL {
+    WITH p, c
+    MATCH (p)-[old:LATESTCONDITION]->(other)
+    WHERE other <> c
+    DELETE old
+}
+MERGE (p)-[r:LATESTCONDITION]->(c)
+"""
+
+NEXT_CONDITION_QUERY = """
+UNWIND $rows AS row
+MATCH (current:Condition {id: row.current})
+MATCH (next:Condition {id: row.next})
+MERGE (current)-[r:NEXTCONDITION]->(next)
+SET current.chain_index = row.index,
+    current.chain_next_type = next.type,
+    next.chain_index = row.index + 1
+"""
+
+NODE_LABELS = ("Patient", "Practitioner", "Organization", "Encounter",
+               "Condition", "Observation", "MedicationRequest", "Procedure")
+RELATIONSHIP_TYPES = ("HASENCOUNTER", "HASCONDITION", "HASOBSERVATION",
+                      "TREATMENTFOR", "HASMEDICATION", "HASPROCEDURE",
+                      "FIRSTCONDITION", "LATESTCONDITION", "NEXTCONDITION")
+
+# Every node and relationship count in one round trip. Each branch aggregates
+# before projecting its names, keeping the bare count shape the planner
+# answers from the count store.
+SUMMARY_QUERY = "\nUNION ALL\n".join(
+    [f"MATCH (n:`{label}`) WITH count(n) AS count RETURN 'nodes' AS kind, '{label}' AS key, count"
+     for label in NODE_LABELS]
+    + [f"MATCH ()-[r:`{rel_type}`]->() WITH count(r) AS count RETURN 'relationships' AS kind, '{rel_type}' AS key, count"
+       for rel_type in RELATIONSHIP_TYPES]
+)
+
+
+@lru_cache(maxsize=128)
+def _compile_path(path: str) -> Tuple[Union[str, int], ...]:
+    """Split a safe_get path like "name[0].given" once into its key and index steps."""
+    steps = []
+    for key in path.split('.'):
+        if '[' in key and ']' in key:
+            # Handle array access like "name[0]"
+            array_key, index = key.split('[', 1)
+            steps.append(array_key)
+            steps.append(int(index.split(']')[0]))
+        else:
+            steps.append(key)
+    return tuple(steps)
+
+
+def _consume(tx: ManagedTransaction, query: str, params: Dict[str, Any]) -> ResultSummary:
+    """Transaction function running a write query to completion."""
+    return tx.run(query, params).consume()
+
+
+async def _consume_async(tx: AsyncManagedTransaction, query: str, params: Dict[str, Any]) -> ResultSummary:
+    """Async transaction function running a write query to completion."""
+    result = await tx.run(query, params)
+    return await result.consume()
+
+
+def _fetch_all(tx: ManagedTransaction, query: str) -> List[Record]:
+    """Transaction function returning every record of a read query."""
+    return list(tx.run(query))
+
+
+async def _fetch_all_async(tx: AsyncManagedTransaction, query: str) -> List[Record]:
+    """Async transaction function returning every record of a read query."""
+    result = await tx.run(query)
+    return [record async for record in result]
+
+
+def _first_text(sub_extensions: List[Dict[str, Any]]) -> str:
+    """Return the valueString of the first "text" sub-extension, or ""."""
+    for sub_ext in sub_extensions:
+        if sub_ext.get("url") == "text":
+            return sub_ext.get("valueString", "")
+    return ""
+
+
+class _BackgroundWriter:
+    """
+    Runs queued write queries on background threads, each with its own session.
+
+    Extraction on the calling thread overlaps with Bolt I/O on the writer
+    threads; sessions aren't thread-safe, so each writer only touches its own.
+    Each batch runs in a managed write transaction, which the driver retries
+    on transient errors. Queued batches commit in any order, so callers use
+    wait() as a barrier before queuing nodes that link to earlier ones. The
+    first failed query stops further writes and is re-raised to the caller.
+    """
+
+    def __init__(self, driver: Driver, writers: int = 1, database: Optional[str] = None, max_pending: int = 4):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error: Optional[Exception] = None
+        self._threads = [
+            threading.Thread(target=self._drain, args=(driver, database), daemon=True)
+            for _ in range(writers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _drain(self, driver: Driver, database: Optional[str]):
+        session = None
+        try:
+            session = driver.session(database=database)
+        except Exception as e:
+            self._error = e
+
+        # Keep draining after a failure, so producers never block on a full queue
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    break
+                if self._error is None:
+                    query, params = item
+                    try:
+                        session.execute_write(_consume, query, params)
+                    except Exception as e:
+                        self._error = e
+            finally:
+                self._queue.task_done()
+
+        if session is not None:
+            session.close()
+
+    def run(self, query: str, **params):
+        """Queue a write query, blocking while max_pending queries are waiting."""
+        if self._error is not None:
+            raise self._error
+        self._queue.put((query, params))
+
+    def wait(self):
+        """Block until every query queued so far has run, then re-raise the first failure."""
+        self._queue.join()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """Wait for every queued query to run, then re-raise the first failure."""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class _QueryBuffer:
+    """Collects write queries from the node creators in place of a _BackgroundWriter."""
+
+    def __init__(self):
+        self.queries: List[Tuple[str, Dict[str, Any]]] = []
+
+    def run(self, query: str, **params):
+        """Record a write query and its parameters."""
+        self.queries.append((query, params))
+
+
+class _LinkTracker:
+    """
+    Forwards node batches to a _BackgroundWriter for the streaming path.
+
+    Notes the child rows written before the parent they reference was read,
+    whose insert-time links found nothing, so they can be linked again once
+    the whole bundle is in. Only parent ids and late link keys are kept.
+    """
+
+    def __init__(self, writer: _BackgroundWriter):
+        self._writer = writer
+        self._labels = {query: label for label, query in NODE_CREATE_QUERIES.items()}
+        self._parents = {parent for links in NODE_LINKS.values() for _, parent, _, _ in links}
+        self._seen = defaultdict(set)  # Ids written so far, per parent label
+        self.late: Dict[str, List[Dict[str, str]]] = defaultdict(list)  # Link rows per child label
+
+    def run(self, query: str, **params):
+        """Record the batch's late links and parent ids, then queue it on the writer."""
+        label = self._labels[query]
+        rows = params["rows"]
+        links = NODE_LINKS.get(label, ())
+        for row in rows:
+            late = {key: row[key] for _, parent, key, _ in links
+                    if row.get(key) and row[key] not in self._seen[parent]}
+            if late:
+                self.late[label].append({"id": row["id"], **late})
+        if label in self._parents:
+            self._seen[label].update(row["id"] for row in rows)
+        self._writer.run(query, **params)
+
+    def wait(self):
+        """Block until every batch queued so far has been written."""
+        self._writer.wait()
+
+
 class FHIRNeo4jInjectorV2:
     """
     Enhanced FHIR to Neo4j injector following the reference tutorial pattern.
     """
 
-    def __init__(self, uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password"):
-        """Initialize the injector with Neo4j connection parameters."""
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri: str = "bolt://localhost:7687", user: str = "neo4j", password: str = "password",
+                 batch_size: int = 1000, writers: int = 4, workers: int = 4, database: Optional[str] = None,
+                 stream_threshold: int = 64 * 1024 * 1024,
+                 max_connection_pool_size: int = 100, connection_acquisition_timeout: float = 60.0,
+                 max_connection_lifetime: float = 3600.0):
+        """
+        Initialize the injector with Neo4j connection parameters.
+
+        Args:
+            uri: Neo4j database URI
+            user: Database username
+            password: Database password
+            batch_size: Rows sent per UNWIND query
+            writers: Concurrent sessions writing phase 1 node batches
+            workers: Number of files injected concurrently by inject_from_directory_v2
+            stream_threshold: File size in bytes from which bundles are stream-parsed
+            database: Target database, or None for the server default
+            max_connection_pool_size: Maximum number of pooled Bolt connections
+            connection_acquisition_timeout: Seconds to wait for a pooled connection
+            max_connection_lifetime: Seconds before a pooled connection is replaced
+        """
+        self._uri = uri
+        self._driver_config = {
+            "auth": (user, password),
+            "max_connection_pool_size": max_connection_pool_size,
+            "connection_acquisition_timeout": connection_acquisition_timeout,
+            "max_connection_lifetime": max_connection_lifetime,
+            "keep_alive": True
+        }
+        self.driver = GraphDatabase.driver(uri, **self._driver_config)
+        self._async_driver: Optional[AsyncDriver] = None
+        self.batch_size = batch_size
+        self.writers = writers
+        self.workers = workers
+        self.stream_threshold = stream_threshold
+        self.database = database
         self.logger = logging.getLogger(__name__)
+        self._summary_cache: Optional[Dict[str, Dict[str, int]]] = None
+        self._summary_generation = 0  # Bumped by every invalidation
 
     def close(self):
         """Close the database connection."""
         self.driver.close()
 
+    def _get_async_driver(self) -> AsyncDriver:
+        """Open the async driver on first use, with the sync driver's settings."""
+        if self._async_driver is None:
+            self._async_driver = AsyncGraphDatabase.driver(self._uri, **self._driver_config)
+        return self._async_driver
+
+    async def close_async(self):
+        """Close the async driver opened by the async methods, if any."""
+        if self._async_driver is not None:
+            await self._async_driver.close()
+            self._async_driver = None
+
     def __enter__(self):
         return self
 
@@ -38,775 +406,754 @@ class FHIRNeo4jInjectorV2:
 
     def clear_database(self):
         """Clear all nodes and relationships from the database."""
-        with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
+        with self.driver.session(database=self.database) as session:
+            session.run(CLEAR_DATABASE_CYPHER)
             self.logger.info("Database cleared")
+        self.invalidate_summary()
 
     def create_constraints(self):
-        """Create uniqueness constraints for all resource types."""
-        constraints = [
-            "CREATE CONSTRAINT pid FOR (p:Patient) REQUIRE p.id IS UNIQUE",
-            "CREATE CONSTRAINT prid FOR (pr:Practitioner) REQUIRE pr.id IS UNIQUE",
-            "CREATE CONSTRAINT oid FOR (o:Organization) REQUIRE o.id IS UNIQUE",
-            "CREATE CONSTRAINT eid FOR (e:Encounter) REQUIRE e.id IS UNIQUE",
-            "CREATE CONSTRAINT cid FOR (c:Condition) REQUIRE c.id IS UNIQUE",
-            "CREATE CONSTRAINT obsid FOR (obs:Observation) REQUIRE obs.id IS UNIQUE",
-            "CREATE CONSTRAINT mrid FOR (mr:MedicationRequest) REQUIRE mr.id IS UNIQUE",
-            "CREATE CONSTRAINT procid FOR (proc:Procedure) REQUIRE proc.id IS UNIQUE"
-        ]
-
-        with self.driver.session() as session:
-            for constraint in constraints:
+        """Create uniqueness constraints and full-text type indexes."""
+        with self.driver.session(database=self.database) as session:
+            for constraint in CONSTRAINTS:
                 try:
                     session.run(constraint)
                     self.logger.info(f"Created constraint: {constraint}")
                 except Exception as e:
                     self.logger.warning(f"Constraint already exists or failed: {e}")
+            for index in FULLTEXT_INDEXES:
+                try:
+                    session.run(index)
+                    self.logger.info(f"Created index: {index}")
+                except Exception as e:
+                    self.logger.warning(f"Index creation failed: {e}")
 
     def extract_reference_id(self, reference: str) -> str:
         """Extract ID from FHIR reference string."""
         if not reference:
             return ""
         # Handle both "urn:uuid:id" and "ResourceType/id" formats
-        if "urn:uuid:" in reference:
-            return reference.replace("urn:uuid:", "")
-        elif "/" in reference:
-            return reference.split("/")[-1]
-        return reference
+        if "/" in reference:
+            return reference.rpartition("/")[2]
+        return reference.removeprefix("urn:uuid:")
 
     def safe_get(self, data: Dict, path: str, default: str = ""):
         """Safely get nested dictionary values using dot notation."""
-        keys = path.split('.')
         current = data
         try:
-            for key in keys:
-                if '[' in key and ']' in key:
-                    # Handle array access like "name[0]"
-                    array_key = key.split('[')[0]
-                    index = int(key.split('[')[1].split(']')[0])
-                    current = current[array_key][index]
-                else:
-                    current = current[key]
+            for step in _compile_path(path):
+                current = current[step]
             return current if current is not None else default
         except (KeyError, IndexError, TypeError):
             return default
 
-    def create_patient_nodes(self, session: Session, bundle_data: Dict[str, Any]):
-        """Create Patient nodes from FHIR Bundle."""
-        entries = bundle_data.get("entry", [])
-        patient_count = 0
-
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") != "Patient":
+    def _bulk_create(self, writer: "_BackgroundWriter", label: str, rows: List[Dict[str, Any]]):
+        """Merge nodes and their parent links with one UNWIND query per batch_size rows."""
+        query = NODE_CREATE_QUERIES[label]
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            writer.run(query, rows=batch)
+
+    def create_patient_nodes(self, writer: "_BackgroundWriter", resources: List[Dict[str, Any]]) -> int:
+        """Queue the bundle's Patient resources as nodes and return how many were queued."""
+        rows = []
+
+        for resource in resources:
+            if not resource.get("id"):
                 continue
 
-            try:
-                # Extract patient data following the reference pattern
-                patient_id = resource.get("id", "")
-
-                # Name extraction
-                names = resource.get("name", [{}])
-                fname = ""
-                lname = ""
-                if names:
-                    name = names[0]
-                    given = name.get("given", [])
-                    fname = " ".join(given) if given else ""
-                    lname = name.get("family", "")
-
-                # Basic demographics
-                sex = resource.get("gender", "")
-                birth_date = resource.get("birthDate", "")
-
-                # Address extraction
-                addresses = resource.get("address", [{}])
-                city = ""
-                state = ""
-                zip_code = ""
-                if addresses:
-                    addr = addresses[0]
-                    city = addr.get("city", "")
-                    state = addr.get("state", "")
-                    zip_code = addr.get("postalCode", "")
-
-                # Extensions for race/ethnicity
-                race = ""
-                ethnicity = ""
-                for ext in resource.get("extension", []):
-                    if "us-core-race" in ext.get("url", ""):
-                        for sub_ext in ext.get("extension", []):
-                            if sub_ext.get("url") == "text":
-                                race = sub_ext.get("valueString", "")
-                    elif "us-core-ethnicity" in ext.get("url", ""):
-                        for sub_ext in ext.get("extension", []):
-                            if sub_ext.get("url") == "text":
-                                ethnicity = sub_ext.get("valueString", "")
-
-                # Create patient node
-                query = """
-                CREATE (p:Patient {
-                    id: $id,
-                    fname: $fname,
-                    lname: $lname,
-                    sex: $sex,
-                    birthDate: $birthDate,
-                    city: $city,
-                    state: $state,
-                    zip: $zip,
-                    race: $race,
-                    ethnicity: $ethnicity
-                })
-                """
-
-                session.run(query, {
-                    "id": patient_id,
-                    "fname": fname,
-                    "lname": lname,
-                    "sex": sex,
-                    "birthDate": birth_date,
-                    "city": city,
-                    "state": state,
-                    "zip": zip_code,
-                    "race": race,
-                    "ethnicity": ethnicity
-                })
-
-                patient_count += 1
-
-            except Exception as e:
-                self.logger.error(f"Error creating patient node: {e}")
-
-        self.logger.info(f"Created {patient_count} Patient nodes")
-
-    def create_practitioner_nodes(self, session: Session, bundle_data: Dict[str, Any]):
-        """Create Practitioner nodes from FHIR Bundle."""
-        entries = bundle_data.get("entry", [])
-        practitioner_count = 0
+            # Extract patient data following the reference pattern
+            patient_id = resource["id"]
+
+            # Name extraction
+            names = resource.get("name", [{}])
+            fname = ""
+            lname = ""
+            if names:
+                name = names[0]
+                given = name.get("given", [])
+                fname = " ".join(given) if given else ""
+                lname = name.get("family") or ""  # Keep null family names in the API paging index
+
+            # Basic demographics
+            sex = resource.get("gender", "")
+            birth_date = resource.get("birthDate", "")
+
+            # Address extraction
+            addresses = resource.get("address", [{}])
+            city = ""
+            state = ""
+            zip_code = ""
+            if addresses:
+                addr = addresses[0]
+                city = addr.get("city", "")
+                state = addr.get("state", "")
+                zip_code = addr.get("postalCode", "")
+
+            # Extensions for race/ethnicity
+            text_values = {"race": "", "ethnicity": ""}
+            for ext in resource.get("extension", []):
+                field = EXT_MAP.get(ext.get("url", "").rpartition("/")[2])
+                if field is not None:
+                    text_values[field] = _first_text(ext.get("extension", []))
+
+            # Queue patient row for the batched create
+            rows.append({
+                "id": patient_id,
+                "fname": fname,
+                "lname": lname,
+                "sex": sex,
+                "birthDate": birth_date,
+                "city": city,
+                "state": state,
+                "zip": zip_code,
+                "race": text_values["race"],
+                "ethnicity": text_values["ethnicity"]
+            })
+
+        self._bulk_create(writer, "Patient", rows)
+        return len(rows)
+
+    def create_practitioner_nodes(self, writer: "_BackgroundWriter", resources: List[Dict[str, Any]]) -> int:
+        """Queue the bundle's Practitioner resources as nodes and return how many were queued."""
+        rows = []
+
+        for resource in resources:
+            if not resource.get("id"):
+                continue
 
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") != "Practitioner":
+            practitioner_id = resource["id"]
+
+            # Name extraction
+            names = resource.get("name", [{}])
+            fname = ""
+            name_full = ""
+            if names:
+                name = names[0]
+                given = name.get("given", [])
+                family = name.get("family", "")
+                fname = " ".join(given) if given else ""
+                name_full = f"{fname} {family}".strip()
+
+            gender = resource.get("gender", "")
+
+            rows.append({
+                "id": practitioner_id,
+                "fname": fname,
+                "name": name_full,
+                "gender": gender
+            })
+
+        self._bulk_create(writer, "Practitioner", rows)
+        return len(rows)
+
+    def create_organization_nodes(self, writer: "_BackgroundWriter", resources: List[Dict[str, Any]]) -> int:
+        """Queue the bundle's Organization resources as nodes and return how many were queued."""
+        rows = []
+
+        for resource in resources:
+            if not resource.get("id"):
                 continue
 
-            try:
-                practitioner_id = resource.get("id", "")
-
-                # Name extraction
-                names = resource.get("name", [{}])
-                fname = ""
-                name_full = ""
-                if names:
-                    name = names[0]
-                    given = name.get("given", [])
-                    family = name.get("family", "")
-                    fname = " ".join(given) if given else ""
-                    name_full = f"{fname} {family}".strip()
-
-                gender = resource.get("gender", "")
-
-                query = """
-                CREATE (pr:Practitioner {
-                    id: $id,
-                    fname: $fname,
-                    name: $name,
-                    gender: $gender
-                })
-                """
-
-                session.run(query, {
-                    "id": practitioner_id,
-                    "fname": fname,
-                    "name": name_full,
-                    "gender": gender
-                })
-
-                practitioner_count += 1
+            org_id = resource["id"]
+            name = resource.get("name", "")
+
+            # Type extraction
+            org_type = ""
+            types = resource.get("type", [])
+            if types and types[0].get("coding"):
+                org_type = types[0]["coding"][0].get("display", "")
+
+            # Address extraction
+            addresses = resource.get("address", [{}])
+            address_city = ""
+            address_state = ""
+            address_line = ""
+            if addresses:
+                addr = addresses[0]
+                address_city = addr.get("city", "")
+                address_state = addr.get("state", "")
+                lines = addr.get("line", [])
+                address_line = ", ".join(lines) if lines else ""
+
+            rows.append({
+                "id": org_id,
+                "name": name,
+                "orgtype": org_type,
+                "addressCity": address_city,
+                "addressState": address_state,
+                "addressLine": address_line
+            })
+
+        self._bulk_create(writer, "Organization", rows)
+        return len(rows)
+
+    def create_encounter_nodes(self, writer: "_BackgroundWriter", resources: List[Dict[str, Any]]) -> int:
+        """Queue the bundle's Encounter resources as nodes and return how many were queued."""
+        rows = []
+        extract_reference_id = self.extract_reference_id  # Local lookup in the per-resource loop
+
+        for resource in resources:
+            if not resource.get("id"):
+                continue
 
-            except Exception as e:
-                self.logger.error(f"Error creating practitioner node: {e}")
+            enc_id = resource["id"]
+            status = resource.get("status", "")
+
+            # Type extraction
+            enc_type = ""
+            types = resource.get("type", [])
+            if types and types[0].get("coding"):
+                enc_type = types[0]["coding"][0].get("display", "")
+
+            # Period extraction
+            period = resource.get("period", {})
+            enc_start = period.get("start", "")
+            enc_end = period.get("end", "")
+
+            # Patient reference
+            subject = resource.get("subject", {})
+            pid = extract_reference_id(subject.get("reference", ""))
+
+            # Organization reference
+            service_provider = resource.get("serviceProvider", {})
+            org_id = extract_reference_id(service_provider.get("reference", ""))
+
+            # Provider reference (if available)
+            provider = ""
+            participants = resource.get("participant", [])
+            for participant in participants:
+                individual = participant.get("individual", {})
+                if individual:
+                    provider = extract_reference_id(individual.get("reference", ""))
+                    break
+
+            rows.append({
+                "id": enc_id,
+                "type": enc_type,
+                "status": status,
+                "encstart": enc_start,
+                "encend": enc_end,
+                "pid": pid,
+                "orgid": org_id,
+                "provider": provider
+            })
+
+        self._bulk_create(writer, "Encounter", rows)
+        return len(rows)
+
+    def create_condition_nodes(self, writer: "_BackgroundWriter", resources: List[Dict[str, Any]],
+                               onsets: Optional[List[Tuple[str, str, str]]] = None) -> int:
+        """
+        Queue Condition nodes from the bundle's Condition resources.
 
-        self.logger.info(f"Created {practitioner_count} Practitioner nodes")
+        Args:
+            writer: Background writer running the UNWIND queries
+            resources: Condition resources
+            onsets: If given, collects (pid, id, onsetdate) for each dated condition
 
-    def create_organization_nodes(self, session: Session, bundle_data: Dict[str, Any]):
-        """Create Organization nodes from FHIR Bundle."""
-        entries = bundle_data.get("entry", [])
-        org_count = 0
+        Returns:
+            Number of Condition nodes queued
+        """
+        rows = []
+        extract_reference_id = self.extract_reference_id
 
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") != "Organization":
+        for resource in resources:
+            if not resource.get("id"):
                 continue
 
-            try:
-                org_id = resource.get("id", "")
-                name = resource.get("name", "")
-
-                # Type extraction
-                org_type = ""
-                types = resource.get("type", [])
-                if types and types[0].get("coding"):
-                    org_type = types[0]["coding"][0].get("display", "")
-
-                # Address extraction
-                addresses = resource.get("address", [{}])
-                address_city = ""
-                address_state = ""
-                address_line = ""
-                if addresses:
-                    addr = addresses[0]
-                    address_city = addr.get("city", "")
-                    address_state = addr.get("state", "")
-                    lines = addr.get("line", [])
-                    address_line = ", ".join(lines) if lines else ""
-
-                query = """
-                CREATE (o:Organization {
-                    id: $id,
-                    name: $name,
-                    orgtype: $orgtype,
-                    addressCity: $addressCity,
-                    addressState: $addressState,
-                    addressLine: $addressLine
-                })
-                """
-
-                session.run(query, {
-                    "id": org_id,
-                    "name": name,
-                    "orgtype": org_type,
-                    "addressCity": address_city,
-                    "addressState": address_state,
-                    "addressLine": address_line
-                })
-
-                org_count += 1
-
-            except Exception as e:
-                self.logger.error(f"Error creating organization node: {e}")
-
-        self.logger.info(f"Created {org_count} Organization nodes")
+            condition_id = resource["id"]
+
+            # Status extraction
+            clinical_status = ""
+            verification_status = ""
+
+            clin_stat = resource.get("clinicalStatus", {})
+            if clin_stat.get("coding"):
+                clinical_status = clin_stat["coding"][0].get("display", "")
+
+            verif_stat = resource.get("verificationStatus", {})
+            if verif_stat.get("coding"):
+                verification_status = verif_stat["coding"][0].get("display", "")
+
+            # Condition code
+            condition_code = ""
+            condition_type = ""
+            code_info = resource.get("code", {})
+            if code_info.get("coding"):
+                coding = code_info["coding"][0]
+                condition_code = coding.get("code", "")
+                condition_type = coding.get("display", "")
+
+            # Dates
+            onset_date = resource.get("onsetDateTime", "")
+            recorded_date = resource.get("recordedDate", "")
+
+            # References
+            subject = resource.get("subject", {})
+            pid = extract_reference_id(subject.get("reference", ""))
+
+            encounter = resource.get("encounter", {})
+            enc_ref = extract_reference_id(encounter.get("reference", ""))
+
+            rows.append({
+                "id": condition_id,
+                "type": condition_type,
+                "clinicalstatus": clinical_status,
+                "verificationstatus": verification_status,
+                "conditioncode": condition_code,
+                "pid": pid,
+                "encref": enc_ref,
+                "onsetdate": onset_date,
+                "recordeddata": recorded_date  # Property name kept from earlier loads
+            })
+            if onsets is not None and pid and onset_date:
+                onsets.append((pid, condition_id, onset_date))
+
+        self._bulk_create(writer, "Condition", rows)
+        return len(rows)
+
+    def create_observation_nodes(self, writer: "_BackgroundWriter", resources: List[Dict[str, Any]]) -> int:
+        """Queue the bundle's Observation resources as nodes and return how many were queued."""
+        rows = []
+        extract_reference_id = self.extract_reference_id
+
+        for resource in resources:
+            if not resource.get("id"):
+                continue
 
-    def create_encounter_nodes(self, session: Session, bundle_data: Dict[str, Any]):
-        """Create Encounter nodes from FHIR Bundle."""
-        entries = bundle_data.get("entry", [])
-        encounter_count = 0
+            obs_id = resource["id"]
+            status = resource.get("status", "")
+
+            # Code extraction
+            obs_code = ""
+            obs_type = ""
+            code_info = resource.get("code", {})
+            if code_info.get("coding"):
+                coding = code_info["coding"][0]
+                obs_code = coding.get("code", "")
+                obs_type = coding.get("display", "")
+
+            # Value extraction
+            value = ""
+            unit = ""
+            if "valueQuantity" in resource:
+                value_qty = resource["valueQuantity"]
+                value = str(value_qty.get("value", ""))
+                unit = value_qty.get("unit", "")
+            elif "valueString" in resource:
+                value = resource["valueString"]
+            elif "valueCodeableConcept" in resource:
+                value_concept = resource["valueCodeableConcept"]
+                if value_concept.get("coding"):
+                    value = value_concept["coding"][0].get("display", "")
+
+            # Dates
+            effective_date = resource.get("effectiveDateTime", "")
+            issued = resource.get("issued", "")
+
+            # References
+            subject = resource.get("subject", {})
+            pid = extract_reference_id(subject.get("reference", ""))
+
+            encounter = resource.get("encounter", {})
+            enc_id = extract_reference_id(encounter.get("reference", ""))
+
+            rows.append({
+                "id": obs_id,
+                "type": obs_type,
+                "status": status,
+                "code": obs_code,
+                "value": value,
+                "unit": unit,
+                "effectivedate": effective_date,
+                "issued": issued,
+                "pid": pid,
+                "encid": enc_id
+            })
+
+        self._bulk_create(writer, "Observation", rows)
+        return len(rows)
+
+    def create_medication_request_nodes(self, writer: "_BackgroundWriter", resources: List[Dict[str, Any]]) -> int:
+        """Queue the bundle's MedicationRequest resources as nodes and return how many were queued."""
+        rows = []
+        extract_reference_id = self.extract_reference_id
+
+        for resource in resources:
+            if not resource.get("id"):
+                continue
 
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") != "Encounter":
+            med_id = resource["id"]
+            status = resource.get("status", "")
+            intent = resource.get("intent", "")
+
+            # Medication extraction
+            medication = ""
+            med_info = resource.get("medicationCodeableConcept", {})
+            if med_info.get("coding"):
+                medication = med_info["coding"][0].get("display", "")
+
+            # Dates
+            authored_on = resource.get("authoredOn", "")
+
+            # References
+            subject = resource.get("subject", {})
+            pid = extract_reference_id(subject.get("reference", ""))
+
+            encounter = resource.get("encounter", {})
+            enc_id = extract_reference_id(encounter.get("reference", ""))
+
+            # Reason reference for treatment relationships
+            reason_id = ""
+            reason_refs = resource.get("reasonReference", [])
+            if reason_refs:
+                reason_id = extract_reference_id(reason_refs[0].get("reference", ""))
+
+            rows.append({
+                "id": med_id,
+                "status": status,
+                "intent": intent,
+                "medication": medication,
+                "authoredOn": authored_on,
+                "pid": pid,
+                "encid": enc_id,
+                "reasonid": reason_id
+            })
+
+        self._bulk_create(writer, "MedicationRequest", rows)
+        return len(rows)
+
+    def create_procedure_nodes(self, writer: "_BackgroundWriter", resources: List[Dict[str, Any]]) -> int:
+        """Queue the bundle's Procedure resources as nodes and return how many were queued."""
+        rows = []
+        extract_reference_id = self.extract_reference_id
+
+        for resource in resources:
+            if not resource.get("id"):
                 continue
 
-            try:
-                enc_id = resource.get("id", "")
-                status = resource.get("status", "")
-
-                # Type extraction
-                enc_type = ""
-                types = resource.get("type", [])
-                if types and types[0].get("coding"):
-                    enc_type = types[0]["coding"][0].get("display", "")
-
-                # Period extraction
-                period = resource.get("period", {})
-                enc_start = period.get("start", "")
-                enc_end = period.get("end", "")
-
-                # Patient reference
-                subject = resource.get("subject", {})
-                pid = self.extract_reference_id(subject.get("reference", ""))
-
-                # Organization reference
-                service_provider = resource.get("serviceProvider", {})
-                org_id = self.extract_reference_id(service_provider.get("reference", ""))
-
-                # Provider reference (if available)
-                provider = ""
-                participants = resource.get("participant", [])
-                for participant in participants:
-                    individual = participant.get("individual", {})
-                    if individual:
-                        provider = self.extract_reference_id(individual.get("reference", ""))
-                        break
-
-                query = """
-                CREATE (e:Encounter {
-                    id: $id,
-                    type: $type,
-                    status: $status,
-                    encstart: $encstart,
-                    encend: $encend,
-                    pid: $pid,
-                    orgid: $orgid,
-                    provider: $provider
-                })
-                """
-
-                session.run(query, {
-                    "id": enc_id,
-                    "type": enc_type,
-                    "status": status,
-                    "encstart": enc_start,
-                    "encend": enc_end,
-                    "pid": pid,
-                    "orgid": org_id,
-                    "provider": provider
-                })
-
-                encounter_count += 1
+            proc_id = resource["id"]
+            status = resource.get("status", "")
+
+            # Procedure code
+            proc_type = ""
+            code_info = resource.get("code", {})
+            if code_info.get("coding"):
+                proc_type = code_info["coding"][0].get("display", "")
+
+            # Date
+            performed_date = ""
+            if "performedDateTime" in resource:
+                performed_date = resource["performedDateTime"]
+            elif "performedPeriod" in resource:
+                period = resource["performedPeriod"]
+                performed_date = period.get("start", "")
+
+            # References
+            subject = resource.get("subject", {})
+            pid = extract_reference_id(subject.get("reference", ""))
+
+            encounter = resource.get("encounter", {})
+            enc_id = extract_reference_id(encounter.get("reference", ""))
+
+            rows.append({
+                "id": proc_id,
+                "type": proc_type,
+                "status": status,
+                "performedDate": performed_date,
+                "pid": pid,
+                "encid": enc_id
+            })
+
+        self._bulk_create(writer, "Procedure", rows)
+        return len(rows)
+
+    def _run_in_batches(self, session: Session, query: str, rows: List[Dict[str, Any]]) -> int:
+        """
+        Run an UNWIND query in one managed write transaction per batch_size rows.
 
-            except Exception as e:
-                self.logger.error(f"Error creating encounter node: {e}")
+        The driver retries a batch that fails with a transient error, such as
+        a deadlock with another file's links to the same nodes. Returns the
+        number of relationships created.
+        """
+        created = 0
+        rows = iter(rows)
+        while batch := list(islice(rows, self.batch_size)):
+            created += session.execute_write(_consume, query, {"rows": batch}).counters.relationships_created
+        return created
 
-        self.logger.info(f"Created {encounter_count} Encounter nodes")
+    def create_temporal_relationships(self, session: Session, onsets: List[Tuple[str, str, str]]):
+        """
+        Create temporal relationships for conditions.
 
-    def create_condition_nodes(self, session: Session, bundle_data: Dict[str, Any]):
-        """Create Condition nodes from FHIR Bundle."""
-        entries = bundle_data.get("entry", [])
-        condition_count = 0
+        Each patient's conditions are ordered by onset date here rather than
+        by the server, and the links go out in one UNWIND query per type.
 
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") != "Condition":
-                continue
+        Args:
+            session: Open Neo4j session
+            onsets: (pid, condition id, onsetdate) of the bundle's dated conditions
+        """
+        try:
+            for rel_type, query, rows in self._temporal_rows(onsets):
+                count = self._run_in_batches(session, query, rows)
+                self.logger.info("Created %d %s relationships", count, rel_type)
 
-            try:
-                condition_id = resource.get("id", "")
-
-                # Status extraction
-                clinical_status = ""
-                verification_status = ""
-
-                clin_stat = resource.get("clinicalStatus", {})
-                if clin_stat.get("coding"):
-                    clinical_status = clin_stat["coding"][0].get("display", "")
-
-                verif_stat = resource.get("verificationStatus", {})
-                if verif_stat.get("coding"):
-                    verification_status = verif_stat["coding"][0].get("display", "")
-
-                # Condition code
-                condition_code = ""
-                condition_type = ""
-                code_info = resource.get("code", {})
-                if code_info.get("coding"):
-                    coding = code_info["coding"][0]
-                    condition_code = coding.get("code", "")
-                    condition_type = coding.get("display", "")
-
-                # Dates
-                onset_date = resource.get("onsetDateTime", "")
-                recorded_date = resource.get("recordedDate", "")
-
-                # References
-                subject = resource.get("subject", {})
-                pid = self.extract_reference_id(subject.get("reference", ""))
-
-                encounter = resource.get("encounter", {})
-                enc_ref = self.extract_reference_id(encounter.get("reference", ""))
-
-                query = """
-                CREATE (c:Condition {
-                    id: $id,
-                    type: $type,
-                    clinicalstatus: $clinicalstatus,
-                    verificationstatus: $verificationstatus,
-                    conditioncode: $conditioncode,
-                    pid: $pid,
-                    encref: $encref,
-                    onsetdate: $onsetdate,
-                    recordeddata: $recordeddate
-                })
-                """
-
-                session.run(query, {
-                    "id": condition_id,
-                    "type": condition_type,
-                    "clinicalstatus": clinical_status,
-                    "verificationstatus": verification_status,
-                    "conditioncode": condition_code,
-                    "pid": pid,
-                    "encref": enc_ref,
-                    "onsetdate": onset_date,
-                    "recordeddate": recorded_date
-                })
-
-                condition_count += 1
+        except Exception as e:
+            self.logger.error("Error creating temporal relationships: %s", e)
+
+    @staticmethod
+    def _temporal_rows(onsets: List[Tuple[str, str, str]]) -> List[Tuple[str, str, List[Dict[str, str]]]]:
+        """Order each patient's conditions by onset date into (type, query, rows) for the temporal links."""
+        first_rows = []
+        latest_rows = []
+        next_rows = []
+
+        onsets.sort(key=itemgetter(0, 2))
+        for pid, conditions in groupby(onsets, key=itemgetter(0)):
+            condition_ids = [condition_id for _, condition_id, _ in conditions]
+            first_rows.append({"pid": pid, "cid": condition_ids[0]})
+            latest_rows.append({"pid": pid, "cid": condition_ids[-1]})
+            next_rows.extend(
+                {"current": current, "next": following, "index": index}
+                for index, (current, following) in enumerate(zip(condition_ids, condition_ids[1:]))
+            )
+
+        return [
+            ("FIRSTCONDITION", FIRST_CONDITION_QUERY, first_rows),
+            ("LATESTCONDITION", LATEST_CONDITION_QUERY, latest_rows),
+            ("NEXTCONDITION", NEXT_CONDITION_QUERY, next_rows)
+        ]
 
-            except Exception as e:
-                self.logger.error(f"Error creating condition node: {e}")
+    def _node_creators(
+        self, onsets: List[Tuple[str, str, str]]
+    ) -> Dict[str, Callable[["_BackgroundWriter", List[Dict[str, Any]]], int]]:
+        """Map each supported resourceType to the method creating its nodes, collecting condition onsets."""
+        return {
+            "Patient": self.create_patient_nodes,
+            "Practitioner": self.create_practitioner_nodes,
+            "Organization": self.create_organization_nodes,
+            "Encounter": self.create_encounter_nodes,
+            "Condition": partial(self.create_condition_nodes, onsets=onsets),
+            "Observation": self.create_observation_nodes,
+            "MedicationRequest": self.create_medication_request_nodes,
+            "Procedure": self.create_procedure_nodes
+        }
+
+    def _log_created(self, counts: Dict[str, int]):
+        """Log the committed node count of each label."""
+        for label, count in counts.items():
+            self.logger.info("Created %d %s nodes", count, label)
+
+    def _create_relationships(self, session: Session, onsets: List[Tuple[str, str, str]]):
+        """Run phase 2 once every node of the bundle and its basic links exist."""
+        self.logger.info("Phase 2: Creating relationships...")
+
+        self.create_temporal_relationships(session, onsets)
+        self.invalidate_summary()
+
+    @staticmethod
+    def _bucket_resources(bundle_data: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Check that bundle_data is a Bundle and partition its resources by type."""
+        if bundle_data.get("resourceType") != "Bundle":
+            raise ValueError("Input data is not a FHIR Bundle")
 
-        self.logger.info(f"Created {condition_count} Condition nodes")
+        # Partition resources by type in a single pass over the entries
+        buckets = defaultdict(list)
+        for entry in bundle_data.get("entry", []):
+            resource = entry.get("resource", {})
+            buckets[resource.get("resourceType")].append(resource)
+        return buckets
 
-    def create_observation_nodes(self, session: Session, bundle_data: Dict[str, Any]):
-        """Create Observation nodes from FHIR Bundle."""
-        entries = bundle_data.get("entry", [])
-        observation_count = 0
+    def inject_fhir_bundle_v2(self, bundle_data: Dict[str, Any]):
+        """
+        Enhanced FHIR Bundle injection with two-phase approach.
+        """
+        buckets = self._bucket_resources(bundle_data)
 
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") != "Observation":
-                continue
+        with self.driver.session(database=self.database) as session:
+            # Phase 1: Create all nodes
+            self.logger.info("Phase 1: Creating nodes...")
+            self.invalidate_summary()
 
+            onsets = []
+            node_creators = self._node_creators(onsets)
+            wave = ()
             try:
-                obs_id = resource.get("id", "")
-                status = resource.get("status", "")
-
-                # Code extraction
-                obs_code = ""
-                obs_type = ""
-                code_info = resource.get("code", {})
-                if code_info.get("coding"):
-                    coding = code_info["coding"][0]
-                    obs_code = coding.get("code", "")
-                    obs_type = coding.get("display", "")
-
-                # Value extraction
-                value = ""
-                unit = ""
-                if "valueQuantity" in resource:
-                    value_qty = resource["valueQuantity"]
-                    value = str(value_qty.get("value", ""))
-                    unit = value_qty.get("unit", "")
-                elif "valueString" in resource:
-                    value = resource["valueString"]
-                elif "valueCodeableConcept" in resource:
-                    value_concept = resource["valueCodeableConcept"]
-                    if value_concept.get("coding"):
-                        value = value_concept["coding"][0].get("display", "")
-
-                # Dates
-                effective_date = resource.get("effectiveDateTime", "")
-                issued = resource.get("issued", "")
-
-                # References
-                subject = resource.get("subject", {})
-                pid = self.extract_reference_id(subject.get("reference", ""))
-
-                encounter = resource.get("encounter", {})
-                enc_id = self.extract_reference_id(encounter.get("reference", ""))
-
-                query = """
-                CREATE (obs:Observation {
-                    id: $id,
-                    type: $type,
-                    status: $status,
-                    code: $code,
-                    value: $value,
-                    unit: $unit,
-                    effectivedate: $effectivedate,
-                    issued: $issued,
-                    pid: $pid,
-                    encid: $encid
-                })
-                """
-
-                session.run(query, {
-                    "id": obs_id,
-                    "type": obs_type,
-                    "status": status,
-                    "code": obs_code,
-                    "value": value,
-                    "unit": unit,
-                    "effectivedate": effective_date,
-                    "issued": issued,
-                    "pid": pid,
-                    "encid": enc_id
-                })
-
-                observation_count += 1
-
+                with _BackgroundWriter(self.driver, self.writers, self.database) as writer:
+                    for wave in CREATION_WAVES:
+                        counts = {resource_type: node_creators[resource_type](writer, buckets[resource_type])
+                                  for resource_type in wave}
+                        # Parents must be committed before the next wave links to them
+                        writer.wait()
+                        self._log_created(counts)
             except Exception as e:
-                self.logger.error(f"Error creating observation node: {e}")
+                self.logger.error("Error creating %s nodes: %s", "/".join(wave), e)
+                raise
 
-        self.logger.info(f"Created {observation_count} Observation nodes")
+            # Phase 2: Create relationships
+            self._create_relationships(session, onsets)
 
-    def create_medication_request_nodes(self, session: Session, bundle_data: Dict[str, Any]):
-        """Create MedicationRequest nodes from FHIR Bundle."""
-        entries = bundle_data.get("entry", [])
-        med_count = 0
+    async def inject_fhir_bundle_async(self, bundle_data: Dict[str, Any]):
+        """
+        Inject a FHIR Bundle with the two-phase approach over the async driver.
 
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") != "MedicationRequest":
-                continue
+        Each wave's node batches are written concurrently from the event loop,
+        at most `writers` at a time, each in its own session. Phase 2 runs in a
+        single session, as in inject_fhir_bundle_v2.
+        """
+        buckets = self._bucket_resources(bundle_data)
 
-            try:
-                med_id = resource.get("id", "")
-                status = resource.get("status", "")
-                intent = resource.get("intent", "")
-
-                # Medication extraction
-                medication = ""
-                med_info = resource.get("medicationCodeableConcept", {})
-                if med_info.get("coding"):
-                    medication = med_info["coding"][0].get("display", "")
-
-                # Dates
-                authored_on = resource.get("authoredOn", "")
-
-                # References
-                subject = resource.get("subject", {})
-                pid = self.extract_reference_id(subject.get("reference", ""))
-
-                encounter = resource.get("encounter", {})
-                enc_id = self.extract_reference_id(encounter.get("reference", ""))
-
-                # Reason reference for treatment relationships
-                reason_id = ""
-                reason_refs = resource.get("reasonReference", [])
-                if reason_refs:
-                    reason_id = self.extract_reference_id(reason_refs[0].get("reference", ""))
-
-                query = """
-                CREATE (mr:MedicationRequest {
-                    id: $id,
-                    status: $status,
-                    intent: $intent,
-                    medication: $medication,
-                    authoredOn: $authoredOn,
-                    pid: $pid,
-                    encid: $encid,
-                    reasonid: $reasonid
-                })
-                """
-
-                session.run(query, {
-                    "id": med_id,
-                    "status": status,
-                    "intent": intent,
-                    "medication": medication,
-                    "authoredOn": authored_on,
-                    "pid": pid,
-                    "encid": enc_id,
-                    "reasonid": reason_id
-                })
-
-                med_count += 1
+        driver = self._get_async_driver()
+        limit = asyncio.Semaphore(self.writers)
 
-            except Exception as e:
-                self.logger.error(f"Error creating medication request node: {e}")
+        async def write(query: str, params: Dict[str, Any]):
+            async with limit, driver.session(database=self.database) as session:
+                await session.execute_write(_consume_async, query, params)
 
-        self.logger.info(f"Created {med_count} MedicationRequest nodes")
+        # Phase 1: Create all nodes
+        self.logger.info("Phase 1: Creating nodes...")
+        self.invalidate_summary()
 
-    def create_procedure_nodes(self, session: Session, bundle_data: Dict[str, Any]):
-        """Create Procedure nodes from FHIR Bundle."""
-        entries = bundle_data.get("entry", [])
-        proc_count = 0
+        onsets = []
+        node_creators = self._node_creators(onsets)
+        wave = ()
+        try:
+            for wave in CREATION_WAVES:
+                batches = _QueryBuffer()
+                counts = {resource_type: node_creators[resource_type](batches, buckets[resource_type])
+                          for resource_type in wave}
+                # Parents must be committed before the next wave links to them
+                await asyncio.gather(*(write(query, params) for query, params in batches.queries))
+                self._log_created(counts)
+        except Exception as e:
+            self.logger.error("Error creating %s nodes: %s", "/".join(wave), e)
+            raise
 
-        for entry in entries:
-            resource = entry.get("resource", {})
-            if resource.get("resourceType") != "Procedure":
-                continue
+        # Phase 2: Create relationships
+        self.logger.info("Phase 2: Creating relationships...")
 
+        async with driver.session(database=self.database) as session:
             try:
-                proc_id = resource.get("id", "")
-                status = resource.get("status", "")
-
-                # Procedure code
-                proc_type = ""
-                code_info = resource.get("code", {})
-                if code_info.get("coding"):
-                    proc_type = code_info["coding"][0].get("display", "")
-
-                # Date
-                performed_date = ""
-                if "performedDateTime" in resource:
-                    performed_date = resource["performedDateTime"]
-                elif "performedPeriod" in resource:
-                    period = resource["performedPeriod"]
-                    performed_date = period.get("start", "")
-
-                # References
-                subject = resource.get("subject", {})
-                pid = self.extract_reference_id(subject.get("reference", ""))
-
-                encounter = resource.get("encounter", {})
-                enc_id = self.extract_reference_id(encounter.get("reference", ""))
-
-                query = """
-                CREATE (proc:Procedure {
-                    id: $id,
-                    type: $type,
-                    status: $status,
-                    performedDate: $performedDate,
-                    pid: $pid,
-                    encid: $encid
-                })
-                """
-
-                session.run(query, {
-                    "id": proc_id,
-                    "type": proc_type,
-                    "status": status,
-                    "performedDate": performed_date,
-                    "pid": pid,
-                    "encid": enc_id
-                })
-
-                proc_count += 1
-
-            except Exception as e:
-                self.logger.error(f"Error creating procedure node: {e}")
-
-        self.logger.info(f"Created {proc_count} Procedure nodes")
-
-    def create_basic_relationships(self, session: Session):
-        """Create basic relationships between nodes."""
-        relationships = [
-            # Patient to Encounter
-            {
-                "query": """
-                MATCH (p:Patient), (e:Encounter)
-                WHERE e.pid = p.id
-                CREATE (p)-[r:HASENCOUNTER]->(e)
-                """,
-                "name": "HASENCOUNTER"
-            },
-            # Patient to Condition
-            {
-                "query": """
-                MATCH (p:Patient), (c:Condition)
-                WHERE c.pid = p.id
-                CREATE (p)-[r:HASCONDITION]->(c)
-                """,
-                "name": "HASCONDITION"
-            },
-            # Encounter to Observation
-            {
-                "query": """
-                MATCH (e:Encounter), (obs:Observation)
-                WHERE obs.encid = e.id
-                CREATE (e)-[r:HASOBSERVATION]->(obs)
-                """,
-                "name": "HASOBSERVATION"
-            },
-            # Encounter to Condition
-            {
-                "query": """
-                MATCH (e:Encounter), (c:Condition)
-                WHERE c.encref = e.id
-                CREATE (e)-[r:HASCONDITION]->(c)
-                """,
-                "name": "ENCOUNTER_HASCONDITION"
-            },
-            # MedicationRequest treatment for Condition
-            {
-                "query": """
-                MATCH (mr:MedicationRequest), (c:Condition)
-                WHERE mr.reasonid = c.id
-                CREATE (mr)-[r:TREATMENTFOR]->(c)
-                """,
-                "name": "TREATMENTFOR"
-            },
-            # Patient to MedicationRequest
-            {
-                "query": """
-                MATCH (p:Patient), (mr:MedicationRequest)
-                WHERE mr.pid = p.id
-                CREATE (p)-[r:HASMEDICATION]->(mr)
-                """,
-                "name": "HASMEDICATION"
-            },
-            # Patient to Procedure
-            {
-                "query": """
-                MATCH (p:Patient), (proc:Procedure)
-                WHERE proc.pid = p.id
-                CREATE (p)-[r:HASPROCEDURE]->(proc)
-                """,
-                "name": "HASPROCEDURE"
-            }
-        ]
+                for rel_type, query, rows in self._temporal_rows(onsets):
+                    count = 0
+                    rows = iter(rows)
+                    while batch := list(islice(rows, self.batch_size)):
+                        summary = await session.execute_write(_consume_async, query, {"rows": batch})
+                        count += summary.counters.relationships_created
+                    self.logger.info("Created %d %s relationships", count, rel_type)
 
-        for rel in relationships:
-            try:
-                result = session.run(rel["query"])
-                count = result.consume().counters.relationships_created
-                self.logger.info(f"Created {count} {rel['name']} relationships")
             except Exception as e:
-                self.logger.error(f"Error creating {rel['name']} relationships: {e}")
+                self.logger.error("Error creating temporal relationships: %s", e)
 
-    def create_temporal_relationships(self, session: Session):
-        """Create temporal relationships for conditions."""
-        try:
-            # First condition for each patient
-            first_condition_query = """
-            MATCH (p:Patient)-[:HASCONDITION]->(c:Condition)
-            WHERE c.onsetdate IS NOT NULL AND c.onsetdate <> ""
-            WITH p, c ORDER BY c.onsetdate ASC
-            WITH p, COLLECT(c)[0] as firstCondition
-            CREATE (p)-[r:FIRSTCONDITION]->(firstCondition)
-            """
-
-            result = session.run(first_condition_query)
-            count = result.consume().counters.relationships_created
-            self.logger.info(f"Created {count} FIRSTCONDITION relationships")
-
-            # Latest condition for each patient
-            latest_condition_query = """
-            MATCH (p:Patient)-[:HASCONDITION]->(c:Condition)
-            WHERE c.onsetdate IS NOT NULL AND c.onsetdate <> ""
-            WITH p, c ORDER BY c.onsetdate DESC
-            WITH p, COLLECT(c)[0] as latestCondition
-            CREATE (p)-[r:LATESTCONDITION]->(latestCondition)
-            """
-
-            result = session.run(latest_condition_query)
-            count = result.consume().counters.relationships_created
-            self.logger.info(f"Created {count} LATESTCONDITION relationships")
-
-            # Next condition relationships
-            next_condition_query = """
-            MATCH (p:Patient)-[:HASCONDITION]->(c:Condition)
-            WHERE c.onsetdate IS NOT NULL AND c.onsetdate <> ""
-            WITH p, c ORDER BY c.onsetdate ASC
-            WITH p, COLLECT(c) as conditions
-            UNWIND range(0, size(conditions)-2) as i
-            WITH conditions[i] as current, conditions[i+1] as next
-            CREATE (current)-[r:NEXTCONDITION]->(next)
-            """
-
-            result = session.run(next_condition_query)
-            count = result.consume().counters.relationships_created
-            self.logger.info(f"Created {count} NEXTCONDITION relationships")
-
-        except Exception as e:
-            self.logger.error(f"Error creating temporal relationships: {e}")
+        self.invalidate_summary()
 
-    def inject_fhir_bundle_v2(self, bundle_data: Dict[str, Any]):
+    def inject_fhir_bundle_streaming(self, file_path: str):
         """
-        Enhanced FHIR Bundle injection with two-phase approach.
+        Stream a FHIR Bundle file and inject it with the two-phase approach.
+
+        Resources are parsed one at a time and each type's nodes are created
+        whenever batch_size of them are buffered, so memory use is bounded by
+        the batch rather than by the bundle. Before a batch is written, the
+        buffered nodes of earlier waves are flushed and committed so that its
+        parent links find them. Children read before their parent, such as an
+        Observation ahead of its Encounter, are linked by id once the whole
+        bundle is written, so the graph matches inject_fhir_bundle_v2's.
         """
-        if bundle_data.get("resourceType") != "Bundle":
-            raise ValueError("Input data is not a FHIR Bundle")
+        onsets = []
+        node_creators = self._node_creators(onsets)
+        buffers = {resource_type: [] for resource_type in node_creators}
+        counts = dict.fromkeys(node_creators, 0)
+        wave_of = {resource_type: i for i, wave in enumerate(CREATION_WAVES) for resource_type in wave}
+        unsettled = set()  # Waves with batches queued since the last wait
+
+        def flush(writer: _LinkTracker, resource_type: str):
+            wave = wave_of[resource_type]
+            for parent_type, parent_wave in wave_of.items():
+                if parent_wave < wave and buffers[parent_type]:
+                    flush(writer, parent_type)
+            if any(queued < wave for queued in unsettled):
+                writer.wait()
+                unsettled.clear()
+
+            counts[resource_type] += node_creators[resource_type](writer, buffers[resource_type])
+            buffers[resource_type] = []
+            unsettled.add(wave)
+
+        with open(file_path, 'rb') as f, self.driver.session(database=self.database) as session:
+            if next(ijson.items(f, "resourceType"), None) != "Bundle":
+                raise ValueError("Input data is not a FHIR Bundle")
+            f.seek(0)
 
-        with self.driver.session() as session:
             # Phase 1: Create all nodes
             self.logger.info("Phase 1: Creating nodes...")
+            self.invalidate_summary()
 
-            self.create_patient_nodes(session, bundle_data)
-            self.create_practitioner_nodes(session, bundle_data)
-            self.create_organization_nodes(session, bundle_data)
-            self.create_encounter_nodes(session, bundle_data)
-            self.create_condition_nodes(session, bundle_data)
-            self.create_observation_nodes(session, bundle_data)
-            self.create_medication_request_nodes(session, bundle_data)
-            self.create_procedure_nodes(session, bundle_data)
+            # Batches of every wave may be in flight here, so a failure is
+            # reported for the file; counts are logged once all are committed
+            try:
+                with _BackgroundWriter(self.driver, self.writers, self.database) as background:
+                    writer = _LinkTracker(background)
+                    for resource in ijson.items(f, "entry.item.resource", use_float=True):
+                        resource_type = resource.get("resourceType")
+                        buffer = buffers.get(resource_type)
+                        if buffer is None:
+                            continue
+
+                        buffer.append(resource)
+                        if len(buffer) >= self.batch_size:
+                            flush(writer, resource_type)
+
+                    for wave in CREATION_WAVES:
+                        for resource_type in wave:
+                            if buffers[resource_type]:
+                                flush(writer, resource_type)
+            except Exception as e:
+                self.logger.error("Error creating nodes from %s: %s", file_path, e)
+                raise
+            self._log_created(counts)
 
-            # Phase 2: Create relationships
-            self.logger.info("Phase 2: Creating relationships...")
+            # Every node is in now, so the links that found no parent can be made
+            for label, rows in writer.late.items():
+                count = self._run_in_batches(session, NODE_LINK_QUERIES[label], rows)
+                self.logger.info("Linked %d %s nodes read before their parent (%d relationships)",
+                                 len(rows), label, count)
 
-            self.create_basic_relationships(session)
-            self.create_temporal_relationships(session)
+            # Phase 2: Create relationships
+            self._create_relationships(session, onsets)
+
+    @staticmethod
+    def load_bundle(file_path: str) -> Dict[str, Any]:
+        """Parse a FHIR Bundle JSON file with orjson, straight from a read-only memory map."""
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            # The view must be released before the map can close
+            with memoryview(mapped) as view:
+                return orjson.loads(view)
+
+    def inject_ndjson_bundles(self, file_path: str):
+        """Inject a newline-delimited JSON file holding one FHIR Bundle per line, a line at a time."""
+        with open(file_path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    self.inject_fhir_bundle_v2(orjson.loads(line))
 
     def inject_from_file_v2(self, file_path: str):
-        """Load and inject FHIR Bundle from a JSON file using v2 approach."""
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                bundle_data = json.load(f)
+        """
+        Load and inject FHIR Bundles from a JSON or NDJSON file using v2 approach.
 
-            self.inject_fhir_bundle_v2(bundle_data)
+        .ndjson files are read one Bundle per line. Other files hold a single
+        Bundle, which is streamed when it is at least stream_threshold bytes
+        and parsed in one call otherwise.
+        """
+        try:
+            if Path(file_path).suffix == ".ndjson":
+                self.inject_ndjson_bundles(file_path)
+            elif os.path.getsize(file_path) >= self.stream_threshold:
+                self.inject_fhir_bundle_streaming(file_path)
+            else:
+                self.inject_fhir_bundle_v2(self.load_bundle(file_path))
             self.logger.info(f"Successfully processed file: {file_path}")
 
         except Exception as e:
@@ -820,49 +1167,92 @@ class FHIRNeo4jInjectorV2:
         if not data_dir.exists():
             raise FileNotFoundError(f"Directory not found: {directory_path}")
 
-        json_files = list(data_dir.glob("*.json"))
-
-        if not json_files:
+        # Paths are listed lazily and at most `workers * 4` files are in flight,
+        # so injection starts at once and memory doesn't grow with the directory
+        json_files = (path for path in data_dir.iterdir() if path.suffix in (".json", ".ndjson"))
+        max_pending = self.workers * 4
+        pending = {}
+        processed = 0
+        failed = 0
+
+        def collect(futures):
+            nonlocal processed, failed
+            for future in futures:
+                json_file = pending.pop(future)
+                processed += 1
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.logger.error(f"Failed to process {json_file}: {e}")
+
+        # Each file opens its own sessions, so files can share the driver across threads
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for json_file in json_files:
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending[executor.submit(self.inject_from_file_v2, str(json_file))] = json_file
+
+            collect(list(as_completed(pending)))
+
+        if processed:
+            self.logger.info(f"Processed {processed} JSON files ({failed} failed)")
+        else:
             self.logger.warning(f"No JSON files found in {directory_path}")
-            return
-
-        self.logger.info(f"Found {len(json_files)} JSON files to process")
 
-        for json_file in json_files:
-            try:
-                self.inject_from_file_v2(str(json_file))
-            except Exception as e:
-                self.logger.error(f"Failed to process {json_file}: {e}")
-                continue
+    def invalidate_summary(self):
+        """Drop the cached summary, so the next get_database_summary_v2 queries the database."""
+        self._summary_generation += 1
+        self._summary_cache = None
 
     def get_database_summary_v2(self) -> Dict[str, int]:
-        """Get enhanced summary of nodes and relationships in the database."""
-        with self.driver.session() as session:
-            # Count nodes by label
-            node_counts = {}
-            labels = ["Patient", "Practitioner", "Organization", "Encounter",
-                     "Condition", "Observation", "MedicationRequest", "Procedure"]
-
-            for label in labels:
-                result = session.run(f"MATCH (n:{label}) RETURN count(n) as count")
-                count = result.single()["count"]
-                node_counts[label] = count
-
-            # Count relationships
-            relationship_counts = {}
-            rel_types = ["HASENCOUNTER", "HASCONDITION", "HASOBSERVATION",
-                        "TREATMENTFOR", "HASMEDICATION", "HASPROCEDURE",
-                        "FIRSTCONDITION", "LATESTCONDITION", "NEXTCONDITION"]
-
-            for rel_type in rel_types:
-                result = session.run(f"MATCH ()-[r:{rel_type}]->() RETURN count(r) as count")
-                count = result.single()["count"]
-                relationship_counts[rel_type] = count
-
-            return {
-                "nodes": node_counts,
-                "relationships": relationship_counts
-            }
+        """
+        Get enhanced summary of nodes and relationships in the database.
+
+        The summary is cached until this injector writes again; call
+        invalidate_summary() after writing to the database some other way.
+        """
+        if self._summary_cache is not None:
+            return {kind: dict(counts) for kind, counts in self._summary_cache.items()}
+
+        generation = self._summary_generation
+        # Seeded in display order; UNION ALL doesn't guarantee branch order
+        summary = {
+            "nodes": dict.fromkeys(NODE_LABELS, 0),
+            "relationships": dict.fromkeys(RELATIONSHIP_TYPES, 0)
+        }
+        with self.driver.session(database=self.database) as session:
+            for kind, key, count in session.execute_read(_fetch_all, SUMMARY_QUERY):
+                summary[kind][key] = count
+
+        # Don't cache counts that a write overlapping the query may have outdated
+        if generation == self._summary_generation:
+            self._summary_cache = summary
+        return {kind: dict(counts) for kind, counts in summary.items()}
+
+    async def get_database_summary_v2_async(self) -> Dict[str, int]:
+        """
+        Async counterpart of get_database_summary_v2, sharing its cache.
+
+        The counts come from the same single-round-trip SUMMARY_QUERY, run
+        over the async driver so callers on an event loop don't block on it.
+        """
+        if self._summary_cache is not None:
+            return {kind: dict(counts) for kind, counts in self._summary_cache.items()}
+
+        generation = self._summary_generation
+        summary = {
+            "nodes": dict.fromkeys(NODE_LABELS, 0),
+            "relationships": dict.fromkeys(RELATIONSHIP_TYPES, 0)
+        }
+        async with self._get_async_driver().session(database=self.database) as session:
+            for kind, key, count in await session.execute_read(_fetch_all_async, SUMMARY_QUERY):
+                summary[kind][key] = count
+
+        if generation == self._summary_generation:
+            self._summary_cache = summary
+        return {kind: dict(counts) for kind, counts in summary.items()}
 
 
 def main_v2():
@@ -876,7 +1266,12 @@ def main_v2():
     )
 
     try:
-        with FHIRNeo4jInjectorV2(config.NEO4J_URI, config.NEO4J_USER, config.NEO4J_PASSWORD) as injector:
+        with FHIRNeo4jInjectorV2(config.NEO4J_URI, config.NEO4J_USER, config.NEO4J_PASSWORD,
+                                 batch_size=config.BATCH_SIZE, writers=config.WRITERS,
+                                 workers=config.WORKERS, database=config.NEO4J_DATABASE,
+                                 stream_threshold=config.STREAM_THRESHOLD,
+                                 max_connection_pool_size=config.POOL_SIZE,
+                                 connection_acquisition_timeout=config.ACQ_TIMEOUT) as injector:
             # Create constraints for better performance
             if config.CREATE_CONSTRAINTS:
                 injector.create_constraints()
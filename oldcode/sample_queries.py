@@ -6,14 +6,34 @@ following the reference tutorial pattern.
 """
 
 import logging
-from neo4j import GraphDatabase
+from contextlib import nullcontext
+from typing import Optional
+from neo4j import GraphDatabase, ManagedTransaction, Session
 import config
 
+def _fetch_preview(tx: ManagedTransaction, query: str, params: dict, limit: int) -> list:
+    """Transaction function fetching the first `limit` records and discarding the rest."""
+    result = tx.run(query, params)
+    records = result.fetch(limit)
+    result.consume()
+    return records
+
+
+def _display_row(record) -> dict:
+    """Turn a record into a dict, joining returned fname and lname columns into one PatientName."""
+    row = dict(record)
+    if "fname" in row and "lname" in row:
+        name = f"{row.pop('fname') or ''} {row.pop('lname') or ''}".strip()
+        row = {"PatientName": name, **row}
+    return row
+
+
 class FHIRQueryExamples:
     """Sample queries for the FHIR Neo4j graph database."""
 
     def __init__(self, uri: str, user: str, password: str):
         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+        self._session: Optional[Session] = None  # Shared by the queries of run_all_samples
 
     def close(self):
         self.driver.close()
@@ -24,25 +44,36 @@ class FHIRQueryExamples:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
 
-    def run_query(self, query: str, description: str):
-        """Run a query and display results."""
+    def run_query(self, query: str, description: str, preview_limit: int = 10, **params):
+        """
+        Run a query with the given parameters and display its first records.
+
+        Runs as a managed read transaction, which the driver retries on
+        transient errors. Only preview_limit + 1 records are pulled; the rest
+        of the result is discarded on the server rather than streamed.
+        """
         print(f"\n{'='*60}")
         print(f"Query: {description}")
         print(f"{'='*60}")
         print(f"Cypher: {query}")
+        if params:
+            print(f"Parameters: {params}")
         print("-" * 60)
 
-        with self.driver.session() as session:
+        session_scope = nullcontext(self._session) if self._session is not None else self.driver.session()
+        with session_scope as session:
             try:
-                result = session.run(query)
-                records = list(result)
+                # One record past the preview says whether any were left out
+                records = session.execute_read(_fetch_preview, query, params, preview_limit + 1)
 
                 if records:
-                    for i, record in enumerate(records[:10]):  # Limit to first 10 results
-                        print(f"  {i+1}. {dict(record)}")
-                    if len(records) > 10:
-                        print(f"  ... and {len(records) - 10} more records")
-                    print(f"\nTotal records: {len(records)}")
+                    for i, record in enumerate(records[:preview_limit]):
+                        print(f"  {i+1}. {_display_row(record)}")
+                    if len(records) > preview_limit:
+                        print("  ... more records not shown")
+                        print(f"\nShowing first {preview_limit} records")
+                    else:
+                        print(f"\nTotal records: {len(records)}")
                 else:
                     print("  No records found.")
 
@@ -79,8 +110,8 @@ class FHIRQueryExamples:
         self.run_query(
             """
             MATCH (p:Patient)
-            RETURN p.fname + ' ' + p.lname as FullName, p.sex, p.birthDate, p.city, p.state
-            ORDER BY FullName
+            RETURN p.fname as fname, p.lname as lname, p.sex, p.birthDate, p.city, p.state
+            ORDER BY fname, lname
             LIMIT 10
             """,
             "List first 10 patients"
@@ -118,7 +149,7 @@ class FHIRQueryExamples:
         self.run_query(
             """
             MATCH (p:Patient)-[:HASENCOUNTER]->(e:Encounter)
-            RETURN p.fname + ' ' + p.lname as PatientName, count(e) as EncounterCount
+            RETURN p.fname as fname, p.lname as lname, count(e) as EncounterCount
             ORDER BY EncounterCount DESC
             LIMIT 10
             """,
@@ -143,15 +174,19 @@ class FHIRQueryExamples:
             "Most common conditions"
         )
 
-        # Patients with specific conditions (example: diabetes)
+        # Patients with specific conditions (example: diabetes), found
+        # through the condition_type_ft index rather than a label scan. The
+        # index matches whole words, so the term is wrapped in wildcards to
+        # keep substring hits such as "Prediabetes"
         self.run_query(
             """
-            MATCH (p:Patient)-[:HASCONDITION]->(c:Condition)
-            WHERE toLower(c.type) CONTAINS 'diabetes'
-            RETURN p.fname + ' ' + p.lname as PatientName, c.type as Condition, c.onsetdate as OnsetDate
+            CALL db.index.fulltext.queryNodes('condition_type_ft', $condition) YIELD node AS c
+            MATCH (p:Patient)-[:HASCONDITION]->(c)
+            RETURN p.fname as fname, p.lname as lname, c.type as Condition, c.onsetdate as OnsetDate
             ORDER BY c.onsetdate
             """,
-            "Patients with diabetes"
+            "Patients with diabetes",
+            condition="*diabetes*"
         )
 
         # Condition progression (using temporal relationships)
@@ -160,7 +195,7 @@ class FHIRQueryExamples:
             MATCH (p:Patient)-[:FIRSTCONDITION]->(first:Condition)
             MATCH (p)-[:LATESTCONDITION]->(latest:Condition)
             WHERE first.id <> latest.id
-            RETURN p.fname + ' ' + p.lname as PatientName,
+            RETURN p.fname as fname, p.lname as lname,
                    first.type as FirstCondition, first.onsetdate as FirstOnset,
                    latest.type as LatestCondition, latest.onsetdate as LatestOnset
             LIMIT 10
@@ -168,13 +203,13 @@ class FHIRQueryExamples:
             "Condition progression over time"
         )
 
-        # Condition chains
+        # Condition chains, read from the chain properties stored at injection
         self.run_query(
             """
-            MATCH path = (c1:Condition)-[:NEXTCONDITION*1..3]->(c2:Condition)
-            MATCH (p:Patient)-[:HASCONDITION]->(c1)
-            RETURN p.fname + ' ' + p.lname as PatientName,
-                   [c in nodes(path) | c.type] as ConditionSequence
+            MATCH (p:Patient)-[:FIRSTCONDITION]->(c:Condition)
+            WHERE c.chain_next_type IS NOT NULL
+            RETURN p.fname as fname, p.lname as lname,
+                   c.type as FirstCondition, c.chain_next_type as NextCondition
             LIMIT 5
             """,
             "Condition progression chains"
@@ -198,20 +233,21 @@ class FHIRQueryExamples:
             "Most common observation types"
         )
 
-        # Vital signs for patients
+        # Vital signs for patients. The phrases match whole words of the
+        # observation type, unlike a substring test, so a name that only
+        # embeds one inside a longer word is no longer returned
         self.run_query(
             """
-            MATCH (p:Patient)-[:HASOBSERVATION]->(obs:Observation)
-            WHERE toLower(obs.type) CONTAINS 'blood pressure' OR
-                  toLower(obs.type) CONTAINS 'heart rate' OR
-                  toLower(obs.type) CONTAINS 'temperature'
-            RETURN p.fname + ' ' + p.lname as PatientName,
-                   obs.type as VitalSign, obs.value + ' ' + obs.unit as Value,
+            CALL db.index.fulltext.queryNodes('observation_type_ft', $vital_signs) YIELD node AS obs
+            MATCH (p:Patient)-[:HASOBSERVATION]->(obs)
+            RETURN p.fname as fname, p.lname as lname,
+                   obs.type as VitalSign, obs.value as Value, obs.unit as Unit,
                    obs.effectivedate as Date
             ORDER BY obs.effectivedate DESC
             LIMIT 20
             """,
-            "Recent vital signs"
+            "Recent vital signs",
+            vital_signs='"blood pressure" OR "heart rate" OR temperature'
         )
 
     def medication_queries(self):
@@ -249,7 +285,7 @@ class FHIRQueryExamples:
             MATCH (p:Patient)-[:HASMEDICATION]->(mr:MedicationRequest)
             WITH p, collect(mr.medication) as Medications, count(mr) as MedCount
             WHERE MedCount >= 2
-            RETURN p.fname + ' ' + p.lname as PatientName, MedCount, Medications[0..5] as SampleMedications
+            RETURN p.fname as fname, p.lname as lname, MedCount, Medications[0..5] as SampleMedications
             ORDER BY MedCount DESC
             LIMIT 10
             """,
@@ -281,7 +317,7 @@ class FHIRQueryExamples:
             WITH p, e ORDER BY e.encstart
             WITH p, collect(e.type)[0..3] as EncounterPattern, count(e) as TotalEncounters
             WHERE TotalEncounters >= 2
-            RETURN p.fname + ' ' + p.lname as PatientName, TotalEncounters, EncounterPattern
+            RETURN p.fname as fname, p.lname as lname, TotalEncounters, EncounterPattern
             ORDER BY TotalEncounters DESC
             LIMIT 10
             """,
@@ -298,15 +334,12 @@ class FHIRQueryExamples:
         self.run_query(
             """
             MATCH (p:Patient)
-            OPTIONAL MATCH (p)-[:HASCONDITION]->(c:Condition)
-            OPTIONAL MATCH (p)-[:HASMEDICATION]->(mr:MedicationRequest)
-            OPTIONAL MATCH (p)-[:HASENCOUNTER]->(e:Encounter)
-            WITH p, count(DISTINCT c) as ConditionCount,
-                    count(DISTINCT mr) as MedicationCount,
-                    count(DISTINCT e) as EncounterCount
+            WITH p, COUNT { (p)-[:HASCONDITION]->() } as ConditionCount,
+                    COUNT { (p)-[:HASMEDICATION]->() } as MedicationCount,
+                    COUNT { (p)-[:HASENCOUNTER]->() } as EncounterCount
             WITH p, (ConditionCount * 2 + MedicationCount + EncounterCount * 0.5) as ComplexityScore
             WHERE ComplexityScore > 0
-            RETURN p.fname + ' ' + p.lname as PatientName,
+            RETURN p.fname as fname, p.lname as lname,
                    ConditionCount, MedicationCount, EncounterCount,
                    round(ComplexityScore, 2) as ComplexityScore
             ORDER BY ComplexityScore DESC
@@ -318,10 +351,13 @@ class FHIRQueryExamples:
         # Comorbidity patterns
         self.run_query(
             """
-            MATCH (p:Patient)-[:HASCONDITION]->(c1:Condition)
-            MATCH (p)-[:HASCONDITION]->(c2:Condition)
-            WHERE c1.id < c2.id AND c1.type IS NOT NULL AND c2.type IS NOT NULL
-            RETURN c1.type as Condition1, c2.type as Condition2, count(p) as CooccurrenceCount
+            MATCH (p:Patient)-[:HASCONDITION]->(c:Condition)
+            WHERE c.type IS NOT NULL
+            WITH p, collect(c) as conditions
+            UNWIND range(0, size(conditions) - 2) as i
+            UNWIND range(i + 1, size(conditions) - 1) as j
+            WITH conditions[i] as c1, conditions[j] as c2
+            RETURN c1.type as Condition1, c2.type as Condition2, count(*) as CooccurrenceCount
             ORDER BY CooccurrenceCount DESC
             LIMIT 15
             """,
@@ -335,13 +371,18 @@ class FHIRQueryExamples:
         print("=" * 80)
 
         try:
-            self.basic_queries()
-            self.patient_queries()
-            self.condition_queries()
-            self.clinical_queries()
-            self.medication_queries()
-            self.encounter_queries()
-            self.complex_queries()
+            with self.driver.session() as session:
+                self._session = session
+                try:
+                    self.basic_queries()
+                    self.patient_queries()
+                    self.condition_queries()
+                    self.clinical_queries()
+                    self.medication_queries()
+                    self.encounter_queries()
+                    self.complex_queries()
+                finally:
+                    self._session = None
 
             print("\n" + "="*80)
             print("QUERY EXECUTION COMPLETED")
@@ -18,7 +18,11 @@ def test_single_file():
     test_file = "data/Benton624_Tremblay80_20d0dd2a-d69c-37f1-6da1-10a5df43cbe9.json"
 
     try:
-        with FHIRNeo4jInjector(config.NEO4J_URI, config.NEO4J_USER, config.NEO4J_PASSWORD) as injector:
+        with FHIRNeo4jInjector(config.NEO4J_URI, config.NEO4J_USER, config.NEO4J_PASSWORD,
+                               batch_size=config.BATCH_SIZE,
+                               max_connection_pool_size=config.POOL_SIZE,
+                               connection_acquisition_timeout=config.ACQ_TIMEOUT,
+                               fetch_size=config.FETCH_SIZE) as injector:
             # Create constraints
             if config.CREATE_CONSTRAINTS:
                 injector.create_constraints()
@@ -47,6 +51,8 @@ def test_single_file():
     except Exception as e:
         print(f"Error: {e}")
         logging.error(f"Test failed: {e}")
+    finally:
+        FHIRNeo4jInjector.shutdown_all()
 
 if __name__ == "__main__":
     test_single_file()
\ No newline at end of file
@@ -18,7 +18,12 @@ def test_single_file_v2():
     test_file = "data/Benton624_Tremblay80_20d0dd2a-d69c-37f1-6da1-10a5df43cbe9.json"
 
     try:
-        with FHIRNeo4jInjectorV2(config.NEO4J_URI, config.NEO4J_USER, config.NEO4J_PASSWORD) as injector:
+        with FHIRNeo4jInjectorV2(config.NEO4J_URI, config.NEO4J_USER, config.NEO4J_PASSWORD,
+                                 batch_size=config.BATCH_SIZE, writers=config.WRITERS,
+                                 workers=config.WORKERS, database=config.NEO4J_DATABASE,
+                                 stream_threshold=config.STREAM_THRESHOLD,
+                                 max_connection_pool_size=config.POOL_SIZE,
+                                 connection_acquisition_timeout=config.ACQ_TIMEOUT) as injector:
             # Create constraints
             if config.CREATE_CONSTRAINTS:
                 injector.create_constraints()